@@ -1,9 +1,18 @@
 import streamlit as st
 import os
 from dotenv import load_dotenv
-from research_paper_assistant.paper_sources import ArxivSource, BiorxivSource, PubmedSource
+from research_paper_assistant.paper_sources import SORT_NEWEST, get_source
 from research_paper_assistant.chat_session import ChatSession
-from research_paper_assistant.bedrock_client import BedrockClient
+from research_paper_assistant.bedrock_client import BedrockClient, BedrockEvent, get_usage_totals
+from research_paper_assistant.federated_search import federated_search, merge_results
+from research_paper_assistant.search_cache import cached_search_page
+from research_paper_assistant.passage_index import DEFAULT_TOKEN_BUDGET, format_passages, get_passage_index
+from research_paper_assistant.token_budget import truncate_to_tokens
+from research_paper_assistant.llm_cache import get_llm_cache
+from research_paper_assistant.paper_summarizer import PaperSummarizer
+from research_paper_assistant.related_index import get_related_index
+from research_paper_assistant.background import JobGroup, get_executor
+from research_paper_assistant import metrics
 
 # Load environment variables
 load_dotenv()
@@ -11,8 +20,41 @@ load_dotenv()
 # Set page config for Japanese support
 st.set_page_config(page_title="研究論文アシスタント", layout="wide")
 
+@st.cache_resource
+def get_bedrock_client():
+    """Create the Bedrock client once per process so reruns keep its connection and throttle state"""
+    return BedrockClient(max_retries=3, retry_delay=1.0)
+
 # Initialize Bedrock client with retry logic
-bedrock = BedrockClient(max_retries=3, retry_delay=1.0)
+bedrock = get_bedrock_client()
+summarizer = PaperSummarizer(bedrock)
+
+# Expose Prometheus metrics when METRICS_PORT is set (no-op on reruns)
+metrics.start_metrics_server()
+
+ALL_SOURCES = "すべてのソース"
+SORT_ORDERS = {"関連度順": None, "最新順": SORT_NEWEST}
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', 2))
+FULLTEXT_WORKERS = int(os.getenv('FULLTEXT_WORKERS', 6))
+VISIBLE_CHAT_MESSAGES = 6  # Older chat messages are shown collapsed
+PREFETCH_POLL_SECONDS = 1.0  # How often the prefetch status and waiting chat panels refresh themselves
+PREFETCH_STATUS_HEIGHT = 220  # The per-paper status list scrolls beyond this height (px)
+# Job status -> (label, st.status state)
+PREFETCH_STATES = {
+    'pending': ("待機中", "running"),
+    'running': ("取得中", "running"),
+    'done': ("取得済み", "complete"),
+    'failed': ("取得に失敗", "error"),
+    'cancelled': ("中止", "error"),
+}
+
+def show_bedrock_event(event: BedrockEvent):
+    """Show retries and failures of Bedrock calls made from the script thread (workers only log them)"""
+    if event.kind == 'retry':
+        st.warning(f"リクエストが失敗しました（{event.code}）。{event.delay:.1f}秒後に再試行します... "
+                   f"({event.attempt}/{bedrock.max_retries})")
+    else:
+        st.error(f"エラーが発生しました: {event.message}")
 
 def init_session_state():
     """Initialize session state variables"""
@@ -26,27 +68,107 @@ def init_session_state():
         st.session_state.expanded_papers = set()
     if 'paper_contents' not in st.session_state:
         st.session_state.paper_contents = {}
+    if 'summary_jobs' not in st.session_state:
+        st.session_state.summary_jobs = None
+    if 'content_jobs' not in st.session_state:
+        st.session_state.content_jobs = None
+    if 'next_page' not in st.session_state:
+        st.session_state.next_page = None
 
 def get_paper_source(source_name: str):
-    """Get paper source instance based on name"""
-    sources = {
-        'arXiv': ArxivSource(),
-        'bioRxiv': BiorxivSource(),
-        'PubMed': PubmedSource()
-    }
-    return sources.get(source_name)
+    """Get the shared paper source instance based on name"""
+    return get_source(source_name)
+
+def search_all_sources(query: str, page_size: int, cursors=None, sort_order=None):
+    """Search every source concurrently and show merged results as each source finishes
+
+    Returns the merged page and the per-source cursors of the sources that have more results.
+    """
+    results_by_source = {}
+    next_cursors = {}
+    placeholder = st.empty()
+    for source_name, results, next_cursor in federated_search(query, page_size, cursors=cursors, sort_order=sort_order):
+        results_by_source[source_name] = results
+        if next_cursor:
+            next_cursors[source_name] = next_cursor
+        merged = merge_results(results_by_source, sort_order)
+        with placeholder.container():
+            st.caption(f"検索完了: {', '.join(results_by_source)}")
+            for paper in merged:
+                st.write(f"- [{paper['source']}] {paper['title']}")
+    placeholder.empty()
+    return merge_results(results_by_source, sort_order), next_cursors or None
+
+def search_page(source: str, query: str, page_size: int, cursor=None, sort_order=None):
+    """Fetch one page of results and the cursor of the next page (None when there are no more)
+
+    Pages come from the search cache shared by all sessions when the same query was run recently.
+    """
+    if source == ALL_SOURCES:
+        return search_all_sources(query, page_size, cursor, sort_order)
+    with metrics.timer('stage_seconds', stage='search', source=source):
+        return cached_search_page(source, query, page_size, cursor, sort_order)
+
+def load_more_results(language: str):
+    """Fetch the next page of the current search and append it to the results"""
+    next_page = st.session_state.next_page
+    with st.spinner("続きの論文を検索中..."):
+        papers, cursor = search_page(next_page['source'], next_page['query'], next_page['page_size'],
+                                     next_page['cursor'], next_page['sort_order'])
+    known = {paper['id'] for paper in st.session_state.papers}
+    papers = [paper for paper in papers if paper['id'] not in known]
+    st.session_state.papers.extend(papers)
+    st.session_state.next_page = {**next_page, 'cursor': cursor} if cursor else None
+    schedule_background_jobs(papers, summarize=language == "日本語", extend=True)
+
+def fetch_full_text(paper):
+    """Fetch full text without touching Streamlit state (safe in worker threads)"""
+    paper_source = get_paper_source(paper.get('source'))
+    if not paper_source:
+        return None
+    with metrics.timer('stage_seconds', stage='full_text', source=paper.get('source')):
+        content = paper_source.get_full_text(paper)
+    index_related(paper, content)
+    return content
+
+def index_related(paper, content=None):
+    """Add a fetched paper (its abstract and, once available, its full text) to the related-papers index"""
+    try:
+        with metrics.timer('stage_seconds', stage='related_index', source=paper.get('source')):
+            get_related_index().add(paper, content)
+    except Exception as e:
+        print(f"Error updating related papers index: {e}")
+
+def content_status(paper_id: str):
+    """Return the prefetch status of a paper and store its content once it is ready"""
+    if paper_id in st.session_state.paper_contents:
+        return 'done'
+    jobs = st.session_state.get('content_jobs')
+    status = jobs.status(paper_id) if jobs else None
+    if status == 'done':
+        content = jobs.result(paper_id)
+        if not content:
+            return 'failed'
+        st.session_state.paper_contents[paper_id] = content
+    return status
 
 def fetch_paper_content(paper):
     """Fetch and store paper content if not already cached"""
     paper_id = paper['id']
-    if paper_id not in st.session_state.paper_contents:
+    status = content_status(paper_id)
+    if status in ('pending', 'running'):
+        # Wait for the prefetch instead of downloading the same paper twice
+        with st.spinner("論文本文を取得中..."):
+            st.session_state.content_jobs.result(paper_id, timeout=None)
+        status = content_status(paper_id)
+    if status is None:
         source_type = paper.get('source')
         paper_source = get_paper_source(source_type)
         
         if paper_source and hasattr(paper_source, 'get_full_text'):
             with st.spinner("論文本文を取得中..."):
                 try:
-                    content = paper_source.get_full_text(paper)
+                    content = fetch_full_text(paper)
                     if content:
                         st.session_state.paper_contents[paper_id] = content
                         return content
@@ -54,94 +176,280 @@ def fetch_paper_content(paper):
                     st.error(f"論文本文の取得に失敗しました: {str(e)}")
     return st.session_state.paper_contents.get(paper_id)
 
-def ask_claude(prompt: str, chat_session: ChatSession = None):
+def summarize_chat_history(summary, messages):
+    """Fold older chat turns into the running conversation summary"""
+    conversation = truncate_to_tokens("\n".join(f"{m.role}: {m.content}" for m in messages), 4000)
+    prompt = f"""以下は論文についての会話の要約と、その後に続く会話です。
+要約に新しい会話の内容を統合し、質問と回答の要点を400字以内の日本語でまとめてください。要約のみを出力してください。
+
+これまでの要約:
+{summary or "（なし）"}
+
+追加する会話:
+{conversation}"""
+    return bedrock.invoke_model(prompt, max_tokens=600, cache=True, on_event=show_bedrock_event)
+
+CHAT_INSTRUCTION = "あなたは研究論文の読解を支援するアシスタントです。与えられた論文の内容を引用しながら質問に回答してください。可能な限り、本文から具体的な箇所を引用してください。"
+
+def build_chat_request(prompt: str, chat_session: ChatSession):
+    """Build the system blocks and messages for a question about a paper
+
+    The paper metadata and the beginning of the text go into a small cached system block; each
+    question adds BM25-selected passages from the rest of the text, the history and the question.
+    """
+    paper = chat_session.paper
+    paper_content = st.session_state.paper_contents.get(paper['id'])
+    turns = chat_session.recent_turns()
+    question = f"新しい質問: {prompt}"
+
+    paper_context, truncated = chat_session.paper_context(paper_content)
+    if paper_content and truncated:
+        # The cached block holds only the beginning of the paper; add relevant passages from the rest
+        budget = chat_session.available_tokens(question, *(content for _, content in turns))
+        passages = get_passage_index(paper['id'], paper_content).retrieve(
+            prompt, token_budget=min(DEFAULT_TOKEN_BUDGET, budget))
+        passages = [p for p in passages if p.text not in paper_context]
+        if passages:
+            question = f"論文本文（質問に関連する抜粋）:\n{format_passages(passages)}\n\n{question}"
+
+    return chat_session.build_request(turns, question, CHAT_INSTRUCTION, paper_content)
+
+def ask_claude(prompt: str, chat_session: ChatSession = None, cache: bool = False):
     """Ask Claude with context and return response with citations"""
     if chat_session:
-        context = chat_session.get_context_for_prompt()
-        paper = chat_session.paper
-        paper_content = st.session_state.paper_contents.get(paper['id'])
-        
-        if paper_content:
-            full_prompt = f"{context}\n\n論文本文:\n{paper_content}\n\n新しい質問: {prompt}\n\n上記の質問に対して、論文の内容を引用しながら回答してください。可能な限り、本文から具体的な箇所を引用してください。"
-        else:
-            full_prompt = f"{context}\n\n新しい質問: {prompt}\n\n上記の質問に対して、論文の内容を引用しながら回答してください。"
+        system, messages = build_chat_request(prompt, chat_session)
+        return bedrock.invoke_model(system=system, messages=messages, cache=cache, on_event=show_bedrock_event)
+    return bedrock.invoke_model(prompt, cache=cache, on_event=show_bedrock_event)
+
+def ask_claude_stream(prompt: str, chat_session: ChatSession = None, cache: bool = False):
+    """Ask Claude with context and yield the response incrementally"""
+    if chat_session:
+        system, messages = build_chat_request(prompt, chat_session)
+        return bedrock.invoke_model_stream(system=system, messages=messages, cache=cache,
+                                           on_event=show_bedrock_event)
+    return bedrock.invoke_model_stream(prompt, cache=cache, on_event=show_bedrock_event)
+
+def build_summary_prompt(paper, paper_content=None, check_cancelled=None) -> str:
+    """Build the Japanese summary prompt for a paper
+
+    Long full texts are summarized section by section first (cached per chunk), so this may call the model.
+    check_cancelled runs before each of those calls and aborts the remaining ones when it raises.
+    """
+    return summarizer.build_prompt(paper, paper_content, language="日本語", check_cancelled=check_cancelled)
+
+def generate_summary(paper, content_jobs: JobGroup = None, jobs: JobGroup = None):
+    """Generate a Japanese summary without touching Streamlit state (safe in worker threads)"""
+    if content_jobs:
+        paper_content = content_jobs.result(paper['id'], timeout=None)
     else:
-        full_prompt = prompt
+        paper_content = fetch_full_text(paper)
+    if jobs:
+        # The search may have been replaced while the full text was downloading
+        jobs.check_cancelled()
+    prompt = build_summary_prompt(paper, paper_content, jobs.check_cancelled if jobs else None)
+    if jobs:
+        jobs.check_cancelled()
+    return bedrock.invoke_model(prompt, cache=True)
+
+def schedule_background_jobs(papers, summarize: bool, extend: bool = False):
+    """Start prefetching full texts (and optionally summaries) for search results
 
-    return bedrock.invoke_model(full_prompt)
+    With extend=True the jobs are added to the current search (a further page) instead of replacing it.
+    """
+    content_jobs = st.session_state.get('content_jobs') if extend else None
+    if content_jobs is None:
+        cancel_background_jobs()
+        content_jobs = JobGroup(get_executor('fulltext', FULLTEXT_WORKERS))
+        st.session_state.content_jobs = content_jobs
+    for paper in papers:
+        content_jobs.submit(paper['id'], fetch_full_text, paper)
+
+    if summarize:
+        summary_jobs = st.session_state.get('summary_jobs') if extend else None
+        if summary_jobs is None:
+            summary_jobs = JobGroup(get_executor('summaries', SUMMARY_WORKERS))
+            st.session_state.summary_jobs = summary_jobs
+        for paper in papers:
+            summary_jobs.submit(paper['id'], generate_summary, paper, content_jobs, summary_jobs)
+
+def cancel_background_jobs():
+    """Cancel prefetch and summary jobs that belong to a previous search"""
+    for name in ('content_jobs', 'summary_jobs'):
+        jobs = st.session_state.get(name)
+        if jobs:
+            jobs.cancel()
+        st.session_state[name] = None
 
 def get_japanese_summary(paper):
     """Get Japanese summary for a paper"""
     paper_id = paper['id']
     if paper_id not in st.session_state.summaries:
-        # Get full text if available
-        paper_content = fetch_paper_content(paper)
-        
-        if paper_content:
-            prompt = f"""以下の論文の要約を日本語で提供してください。専門用語は適切に説明し、研究の意義が一般の読者にも伝わるようにしてください：
+        jobs = st.session_state.get('summary_jobs')
+        if jobs and jobs.status(paper_id) in ('pending', 'running', 'done'):
+            # Wait for the background job instead of issuing a duplicate request
+            with st.spinner("要約を翻訳・解説中..."):
+                summary = jobs.result(paper_id, timeout=None)
+        else:
+            paper_content = fetch_paper_content(paper)
+            with st.spinner("要約を翻訳・解説中..."):
+                summary = ask_claude(build_summary_prompt(paper, paper_content), cache=True)
+        if summary:
+            st.session_state.summaries[paper_id] = summary
+            return summary
+        return paper['summary']
+    return st.session_state.summaries[paper_id]
 
-タイトル: {paper['title']}
-著者: {paper['authors']}
-原文要約: {paper['summary']}
-分野: {paper['primary_category']}
+def render_japanese_summary(paper):
+    """Render the Japanese summary, streaming it if no background result is available"""
+    paper_id = paper['id']
+    jobs = st.session_state.get('summary_jobs')
+    if paper_id in st.session_state.summaries or (jobs and jobs.status(paper_id) in ('pending', 'running', 'done')):
+        st.write(get_japanese_summary(paper))
+        return
 
-論文本文:
-{paper_content[:2000]}  # 最初の2000文字のみ使用
+    paper_content = fetch_paper_content(paper)
+    with st.spinner("本文をセクションごとに要約中..."):
+        prompt = build_summary_prompt(paper, paper_content)
+    summary = st.write_stream(ask_claude_stream(prompt, cache=True))
+    if summary:
+        st.session_state.summaries[paper_id] = summary
+    else:
+        st.write(paper['summary'])
 
-上記の内容を踏まえて、以下の点に焦点を当てて要約してください：
-1. 研究の背景と目的
-2. 主な手法と結果
-3. 研究の意義と今後の展望"""
-        else:
-            prompt = f"""以下の論文の要約を日本語で提供してください。専門用語は適切に説明し、研究の意義が一般の読者にも伝わるようにしてください：
+def render_chat_interface(paper_id: str, index: int):
+    """Render chat interface for a specific paper
 
-タイトル: {paper['title']}
-著者: {paper['authors']}
-原文要約: {paper['summary']}
-分野: {paper['primary_category']}"""
-        
-        with st.spinner("要約を翻訳・解説中..."):
-            summary = ask_claude(prompt)
-            if summary:
-                st.session_state.summaries[paper_id] = summary
-                return summary
-            return paper['summary']
-    return st.session_state.summaries[paper_id]
+    While the full text is still being fetched the chat refreshes itself, so it becomes
+    available without rerunning the whole app.
+    """
+    paper = next(p for p in st.session_state.papers if p['id'] == paper_id)
+    if content_status(paper_id) is None:
+        # No prefetch was scheduled for this paper
+        fetch_paper_content(paper)
+    loading = content_status(paper_id) in ('pending', 'running')
+    st.fragment(_chat_panel, run_every=PREFETCH_POLL_SECONDS if loading else None)(paper_id, index)
 
-def render_chat_interface(paper_id: str, index: int):
-    """Render chat interface for a specific paper"""
+def _chat_panel(paper_id: str, index: int):
+    paper = next(p for p in st.session_state.papers if p['id'] == paper_id)
     if paper_id not in st.session_state.chat_sessions:
-        paper = next(p for p in st.session_state.papers if p['id'] == paper_id)
-        st.session_state.chat_sessions[paper_id] = ChatSession(paper)
-        # Fetch paper content when initializing chat session
-        fetch_paper_content(paper)
+        st.session_state.chat_sessions[paper_id] = ChatSession(paper, summarizer=summarize_chat_history)
     
     chat_session = st.session_state.chat_sessions[paper_id]
     
     # Display content status
-    if paper_id in st.session_state.paper_contents:
+    status = content_status(paper_id)
+    loading = status in ('pending', 'running')
+    if status == 'done':
         st.info("📄 論文本文を利用可能です。より詳細な回答が得られます。")
+    elif loading:
+        st.info("⏳ 論文本文を取得中です。取得が完了すると質問できます。")
     
-    # Display chat history
-    for msg in chat_session.messages:
+    # Display chat history; older turns are collapsed into one cached Markdown block
+    older = max(0, len(chat_session.messages) - VISIBLE_CHAT_MESSAGES)
+    if older:
+        with st.expander(f"これまでの会話（{older}件）"):
+            st.markdown(chat_session.history_markdown(older))
+    for msg in chat_session.messages[older:]:
         with st.chat_message(msg.role):
             st.markdown(chat_session.format_message_for_display(msg))
     
     # Chat input with unique key
-    if prompt := st.chat_input("論文について質問してください", key=f"chat_input_{paper_id}_{index}"):
+    if prompt := st.chat_input("論文について質問してください", key=f"chat_input_{paper_id}_{index}", disabled=loading):
         with st.chat_message("user"):
             st.markdown(prompt)
+        # Build the prompt before recording the question so it is not repeated in the history
+        stream = ask_claude_stream(prompt, chat_session)
         chat_session.add_message("user", prompt)
         
         with st.chat_message("assistant"):
-            with st.spinner("回答を生成中..."):
-                response = ask_claude(prompt, chat_session)
-                if response:
-                    st.markdown(response)
-                    chat_session.add_message("assistant", response)
+            response = st.write_stream(stream)
+            if response:
+                chat_session.add_message("assistant", response)
+
+def render_related_papers(paper):
+    """List similar papers from the local index of already fetched abstracts and full texts"""
+    index = get_related_index()
+    if not index.contains(paper):
+        # Not fetched yet (e.g. prefetch still running): index the abstract now, it is a local operation
+        index_related(paper)
+    with metrics.timer('stage_seconds', stage='related_papers', source=paper.get('source')):
+        related = index.related(paper)
+    with st.expander(f"関連論文（{len(related)}件）"):
+        if not related:
+            st.caption("関連する論文はまだありません。検索して論文を取得するほど見つかりやすくなります。")
+        for other, score in related:
+            st.markdown(f"- [{other['title']}]({other['pdf_url']}) — {other['source']}, {other['published']}"
+                        f"（類似度 {score:.2f}）")
+
+@st.fragment
+def render_paper_panel(index: int, language: str):
+    """Render one paper; interactions inside rerun only this panel"""
+    paper = st.session_state.papers[index]
+    st.markdown(f"## {paper['title']}")
+    st.write(f"**著者:** {paper['authors']}")
+    st.write(f"**公開日:** {paper['published']}")
+    st.write(f"**分野:** {paper['primary_category']}")
+    st.write(f"**ソース:** {paper['source']}")
+    
+    # Summary display
+    if st.button("要約を表示/非表示", key=f"summary_button_{paper['id']}"):
+        if paper['id'] in st.session_state.expanded_papers:
+            st.session_state.expanded_papers.remove(paper['id'])
+        else:
+            st.session_state.expanded_papers.add(paper['id'])
+    
+    if paper['id'] in st.session_state.expanded_papers:
+        with st.container():
+            if language == "日本語":
+                render_japanese_summary(paper)
+            else:
+                st.write(paper['summary'])
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.link_button("PDFを表示", paper['pdf_url'])
+    
+    render_related_papers(paper)
+    
+    # Chat interface for each paper
+    st.markdown("### 論文について質問する")
+    render_chat_interface(paper['id'], index)
+
+@st.fragment(run_every=PREFETCH_POLL_SECONDS)
+def render_prefetch_progress():
+    """Show the full-text prefetch status of each paper while any is unfinished (polls only this fragment)"""
+    jobs = st.session_state.get('content_jobs')
+    if not jobs or not jobs.futures:
+        return
+    statuses = {paper_id: jobs.status(paper_id) for paper_id in list(jobs.futures)}
+    finished = sum(1 for status in statuses.values() if status not in ('pending', 'running'))
+    if finished == len(statuses):
+        return
+    titles = {paper['id']: paper['title'] for paper in st.session_state.papers}
+    st.caption(f"論文本文を取得中... ({finished}/{len(statuses)})")
+    with st.container(height=PREFETCH_STATUS_HEIGHT):
+        for paper_id, status in statuses.items():
+            label, state = PREFETCH_STATES[status]
+            st.status(f"{titles.get(paper_id, paper_id)[:80]} — {label}", state=state)
+
+def render_cache_stats():
+    """Show LLM cache and prompt cache effectiveness in the sidebar"""
+    stats = get_llm_cache().stats()
+    st.sidebar.caption(
+        f"要約キャッシュ: ヒット率 {stats['hit_rate']:.0%} "
+        f"({stats['hits']}/{stats['hits'] + stats['misses']})・"
+        f"節約トークン {stats['tokens_saved']:,}"
+    )
+    usage = get_usage_totals()
+    st.sidebar.caption(
+        f"プロンプトキャッシュ: 読み込み {usage['cache_read']:,}・"
+        f"書き込み {usage['cache_write']:,}・"
+        f"非キャッシュ入力 {usage['input']:,} トークン"
+    )
 
 def main():
     init_session_state()
+    render_cache_stats()
     
     st.title("研究論文アシスタント")
     st.write("arXiv、bioRxiv、PubMedの論文を検索し、AIを使用して分析・質問ができます")
@@ -149,7 +457,7 @@ def main():
     # Source selection
     source = st.selectbox(
         "論文ソースを選択",
-        ["arXiv", "bioRxiv", "PubMed"]
+        ["arXiv", "bioRxiv", "PubMed", ALL_SOURCES]
     )
     
     # Language selection
@@ -164,63 +472,57 @@ def main():
         
         col1, col2 = st.columns(2)
         with col1:
-            max_results = st.slider("表示する論文数", 1, 10, 5)
+            page_size = st.slider("一度に読み込む論文数", 1, 50, 10)
         with col2:
-            sort_order = st.selectbox(
+            sort_order = SORT_ORDERS[st.selectbox(
                 "並び順",
-                ["関連度順", "最新順"]
-            )
+                list(SORT_ORDERS)
+            )]
             
         submitted = st.form_submit_button("検索")
         
         if submitted and query:
             with st.spinner("論文を検索中..."):
-                paper_source = get_paper_source(source)
-                if paper_source:
-                    papers = paper_source.search(query, max_results)
-                    if papers:
-                        st.session_state.papers = papers
-                        # Clear previous session data when new search is performed
-                        st.session_state.summaries = {}
-                        st.session_state.expanded_papers = set()
-                        st.session_state.paper_contents = {}
-                        st.session_state.chat_sessions = {}
-                    else:
-                        st.warning("論文が見つかりませんでした")
+                papers, cursor = search_page(source, query, page_size, sort_order=sort_order)
+                if papers:
+                    st.session_state.papers = papers
+                    # Clear previous session data when new search is performed
+                    st.session_state.summaries = {}
+                    st.session_state.expanded_papers = set()
+                    st.session_state.paper_contents = {}
+                    st.session_state.chat_sessions = {}
+                    st.session_state.selected_paper = 0
+                    # Further pages are fetched on demand from this cursor
+                    st.session_state.next_page = (
+                        {'source': source, 'query': query, 'page_size': page_size, 'cursor': cursor,
+                         'sort_order': sort_order}
+                        if cursor else None
+                    )
+                    schedule_background_jobs(papers, summarize=language == "日本語")
+                else:
+                    st.warning("論文が見つかりませんでした")
     
-    # Display results in tabs
+    # Display results: only the selected paper is rendered, each panel in its own fragment
     if 'papers' in st.session_state and st.session_state.papers:
-        tabs = st.tabs([f"論文 {i+1}: {paper['title'][:50]}..." for i, paper in enumerate(st.session_state.papers)])
-        
-        for i, (tab, paper) in enumerate(zip(tabs, st.session_state.papers)):
-            with tab:
-                st.markdown(f"## {paper['title']}")
-                st.write(f"**著者:** {paper['authors']}")
-                st.write(f"**公開日:** {paper['published']}")
-                st.write(f"**分野:** {paper['primary_category']}")
-                st.write(f"**ソース:** {paper['source']}")
-                
-                # Summary display
-                if st.button("要約を表示/非表示", key=f"summary_button_{paper['id']}"):
-                    if paper['id'] in st.session_state.expanded_papers:
-                        st.session_state.expanded_papers.remove(paper['id'])
-                    else:
-                        st.session_state.expanded_papers.add(paper['id'])
-                
-                if paper['id'] in st.session_state.expanded_papers:
-                    with st.container():
-                        if language == "日本語":
-                            st.write(get_japanese_summary(paper))
-                        else:
-                            st.write(paper['summary'])
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    st.link_button("PDFを表示", paper['pdf_url'])
-                
-                # Chat interface for each paper
-                st.markdown("### 論文について質問する")
-                render_chat_interface(paper['id'], i)
+        render_prefetch_progress()
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            if st.session_state.next_page and st.button("さらに読み込む", key="load_more"):
+                load_more_results(language)
+                # Rerun so the selector lists the new papers and the button reflects the new cursor
+                st.rerun()
+        papers = st.session_state.papers
+        with col1:
+            more = "（続きあり）" if st.session_state.next_page else ""
+            st.caption(f"{len(papers)}件の論文を表示中{more}")
+        selected = st.selectbox(
+            "論文を選択",
+            range(len(papers)),
+            format_func=lambda i: f"論文 {i+1}: {papers[i]['title'][:80]}",
+            key="selected_paper",
+            label_visibility="collapsed"
+        )
+        render_paper_panel(selected, language)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""Streamlitアプリの起動時間と再実行（rerun）時間のベンチマーク
+
+使い方:
+    python benchmarks/bench_app_startup.py
+    python benchmarks/bench_app_startup.py --repeat 10 --reruns 30
+
+- import: app.py が読み込むパッケージのインポート時間（新しいプロセスごと）
+- first run: 新しいプロセスでの app.py の初回実行時間（インポートとリソースの生成を含む）
+- rerun: 同じセッションでの再実行時間（検索前、および検索結果と各論文の会話履歴がある状態）
+
+検索はローカルスタブ（benchmarks/stubs.py）に向けて行うため、ネットワークは不要。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP = ROOT / 'app.py'
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import streamlit
+import research_paper_assistant.paper_sources
+import research_paper_assistant.chat_session
+import research_paper_assistant.bedrock_client
+import research_paper_assistant.federated_search
+import research_paper_assistant.passage_index
+import research_paper_assistant.llm_cache
+import research_paper_assistant.background
+print(time.perf_counter() - start)
+"""
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    env['PAPER_ASSISTANT_CACHE_DIR'] = tempfile.mkdtemp(prefix='paper_assistant_bench_')
+    env.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    env.setdefault('AWS_CLAUDE_MODEL_ID', 'stub-model')
+    for api in ('ARXIV', 'BIORXIV', 'NCBI'):
+        env[f'{api}_RATE_LIMIT'] = '1000000'
+    return env
+
+
+def measure_import(repeat: int) -> list:
+    snippet = IMPORT_SNIPPET.format(root=str(ROOT))
+    return [float(subprocess.check_output([sys.executable, '-c', snippet], env=child_env(), text=True))
+            for _ in range(repeat)]
+
+
+def run_session(reruns: int, results: int, chat_turns: int) -> dict:
+    """子プロセス内で実行: 初回実行・再実行の時間を計測してJSONで返す"""
+    sys.path.insert(0, str(ROOT))
+    sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(str(APP), default_timeout=60).run()
+    first_run = time.perf_counter() - start
+
+    def timed_reruns():
+        times = []
+        for _ in range(reruns):
+            t0 = time.perf_counter()
+            at.run()
+            times.append(time.perf_counter() - t0)
+        return times
+
+    idle = timed_reruns()
+
+    from stubs import StubHTTPServer
+    from research_paper_assistant.paper_sources import get_source
+    server = StubHTTPServer().start()
+    server.configure_sources({name: get_source(name) for name in ('arXiv', 'bioRxiv', 'PubMed')})
+    # 要約のバックグラウンド生成（Bedrock呼び出し）を避けるため英語を選ぶ
+    at.selectbox[0].set_value('PubMed')
+    at.selectbox[1].set_value('English')
+    at.text_input[0].input('crispr base editing')
+    at.slider[0].set_value(results)
+    at.button[0].click().run()
+    time.sleep(1.0)  # 本文の先読みの完了を待つ
+    at.run()
+
+    # 各論文に会話履歴がある状態にする
+    from research_paper_assistant.chat_session import ChatSession
+    for paper in at.session_state.papers:
+        session = ChatSession(paper)
+        for turn in range(chat_turns):
+            session.add_message('user', f"質問{turn}: この論文の手法を説明してください。")
+            session.add_message('assistant', "## 回答\n\n" + "本研究では**塩基編集**を用いて変異を導入した。" * 20)
+        at.session_state.chat_sessions[paper['id']] = session
+    with_results = timed_reruns()
+    server.stop()
+
+    return {'first_run': first_run, 'idle': idle, 'with_results': with_results,
+            'exceptions': [str(e.value) for e in at.exception]}
+
+
+def summarize(name: str, values: list):
+    values_ms = [v * 1000 for v in values]
+    print(f"{name:28s} median {statistics.median(values_ms):8.1f} ms   "
+          f"min {min(values_ms):8.1f} ms   max {max(values_ms):8.1f} ms   (n={len(values_ms)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='新しいプロセスでの計測回数')
+    parser.add_argument('--reruns', type=int, default=20, help='1セッションでの再実行回数')
+    parser.add_argument('--results', type=int, default=10, help='表示する検索結果の件数')
+    parser.add_argument('--chat-turns', type=int, default=5, help='各論文の会話履歴のターン数')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_session(args.reruns, args.results, args.chat_turns)))
+        return
+
+    summarize('import', measure_import(args.repeat))
+
+    sessions = []
+    for _ in range(args.repeat):
+        output = subprocess.check_output(
+            [sys.executable, __file__, '--child', '--reruns', str(args.reruns), '--results', str(args.results),
+             '--chat-turns', str(args.chat_turns)],
+            env=child_env(), text=True, stderr=subprocess.DEVNULL)
+        sessions.append(json.loads(output.strip().splitlines()[-1]))
+
+    summarize('first run (cold process)', [s['first_run'] for s in sessions])
+    summarize('rerun, no results', [t for s in sessions for t in s['idle']])
+    summarize(f'rerun, {args.results} results+chat', [t for s in sessions for t in s['with_results']])
+    errors = {e for s in sessions for e in s['exceptions']}
+    if errors:
+        print(f"app exceptions: {errors}")
+
+
+if __name__ == '__main__':
+    main()
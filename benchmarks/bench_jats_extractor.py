@@ -0,0 +1,161 @@
+"""JATS本文抽出のベンチマーク（従来のBeautifulSoup実装とlxmlストリーミング実装の比較）
+
+使い方:
+    python benchmarks/bench_jats_extractor.py                 # 合成した大きなJATSで計測
+    python benchmarks/bench_jats_extractor.py --file a.xml    # 手元のPMC/bioRxiv XMLで計測
+
+処理時間は同一プロセス内で複数回計測した中央値、ピークメモリは実装ごとに
+別プロセスで計測した最大RSSの増分（lxml/libxml2のC側の確保も含む）。
+"""
+import argparse
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from research_paper_assistant.jats_extractor import extract_text  # noqa: E402
+
+
+def legacy_extract(xml: bytes) -> str:
+    """変更前の PaperSource._extract_text_from_xml / _process_section と同じ処理"""
+    from bs4 import BeautifulSoup
+
+    def process_section(element) -> List[str]:
+        sections = []
+        title = element.find('title', recursive=False)
+        if title:
+            sections.append(f"\nSection: {title.text.strip()}")
+        for p in element.find_all('p', recursive=False):
+            text = p.get_text(separator=' ', strip=True)
+            if text:
+                sections.append(text)
+        for subsec in element.find_all('sec', recursive=False):
+            sections.extend(process_section(subsec))
+        return sections
+
+    soup = BeautifulSoup(xml, 'xml')
+    sections = []
+    title = soup.find('article-title')
+    if title:
+        sections.append(f"Title: {title.text}")
+    abstract = soup.find('abstract')
+    if abstract:
+        sections.append("\nAbstract:")
+        sections.append(abstract.get_text(strip=True))
+    body = soup.find('body')
+    if body:
+        sections.extend(process_section(body))
+    return '\n\n'.join(filter(None, sections))
+
+
+IMPLEMENTATIONS = {
+    'bs4': legacy_extract,
+    'lxml-stream': extract_text,
+}
+
+
+def make_large_jats(sections: int = 60, paragraphs: int = 12, figures: int = 6, table_rows: int = 40) -> bytes:
+    """図表を多く含む大きなPMC風のJATS XMLを生成"""
+    sentence = ("The <italic>observed</italic> effect of <xref ref-type=\"bibr\" rid=\"b1\">1</xref> "
+                "was significant (<italic>p</italic> &lt; 0.05) across all cohorts. ")
+    parts = ['<?xml version="1.0"?><article xmlns:xlink="http://www.w3.org/1999/xlink">',
+             '<front><article-meta><title-group><article-title>Synthetic benchmark article</article-title>'
+             '</title-group><abstract><p>', sentence * 5, '</p></abstract></article-meta></front><body>']
+    for s in range(sections):
+        parts.append(f'<sec id="s{s}"><title>Section {s}</title>')
+        for p in range(paragraphs):
+            parts.append(f'<p>{sentence * 4}</p>')
+        for f in range(figures):
+            parts.append(f'<fig id="f{s}-{f}"><label>Figure {f}</label><caption><title>Figure</title>'
+                         f'<p>{sentence}</p></caption><graphic xlink:href="f{s}-{f}.jpg"/></fig>')
+        rows = ''.join(f'<tr>{"<td>0.123</td>" * 8}</tr>' for _ in range(table_rows))
+        parts.append(f'<table-wrap><table><tbody>{rows}</tbody></table></table-wrap>')
+        parts.append(f'<sec><title>Subsection {s}</title><p>{sentence * 3}</p></sec></sec>')
+    parts.append('</body><back><ref-list>')
+    parts.extend(f'<ref id="b{i}"><element-citation><article-title>Ref {i}</article-title>'
+                 f'</element-citation></ref>' for i in range(200))
+    parts.append('</ref-list></back></article>')
+    return ''.join(parts).encode('utf-8')
+
+
+def max_rss_bytes() -> int:
+    """このプロセスの最大RSS（Linuxではexec時にリセットされるVmHWMを優先）"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure_peak_memory(impl: str, path: Path) -> int:
+    """別プロセスで1回抽出し、最大RSSの増分を返す"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', impl, '--file', str(path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return int(output.strip().splitlines()[-1])
+
+
+def run_child(impl: str, path: Path):
+    import bs4  # noqa: F401  インポート分のメモリを計測から除く
+    baseline = max_rss_bytes()
+    if impl == 'lxml-stream':
+        with open(path, 'rb') as f:
+            IMPLEMENTATIONS[impl](f)
+    else:
+        IMPLEMENTATIONS[impl](path.read_bytes())
+    print(max_rss_bytes() - baseline)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--file', type=Path, action='append', help='計測に使うJATS XMLファイル')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--child', choices=IMPLEMENTATIONS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.file[0])
+        return
+
+    files = args.file
+    if not files:
+        tmp = Path(tempfile.mkdtemp()) / 'synthetic_jats.xml'
+        tmp.write_bytes(make_large_jats())
+        files = [tmp]
+
+    for path in files:
+        # 親プロセスのメモリ使用量の影響を受けないよう、先に別プロセスで計測する
+        peak_memory = {impl: measure_peak_memory(impl, path) for impl in IMPLEMENTATIONS}
+        data = path.read_bytes()
+        expected = legacy_extract(data)
+        assert extract_text(data) == expected, f"output mismatch for {path}"
+        print(f"{path.name}: {len(data) / 1024 / 1024:.1f} MiB, {len(expected):,} chars extracted")
+
+        results = {}
+        for impl, fn in IMPLEMENTATIONS.items():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                fn(data)
+                timings.append(time.perf_counter() - start)
+            results[impl] = (statistics.median(timings), peak_memory[impl])
+            print(f"  {impl:12s} median {results[impl][0] * 1000:8.1f} ms   "
+                  f"peak RSS +{results[impl][1] / 1024 / 1024:6.1f} MiB")
+
+        (base_time, base_mem), (new_time, new_mem) = results['bs4'], results['lxml-stream']
+        print(f"  speedup x{base_time / new_time:.1f}, peak memory x{base_mem / max(new_mem, 1):.1f} lower")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""検索結果を保持するセッションあたりのメモリと、検索結果のシリアライズのベンチマーク
+
+使い方:
+    python benchmarks/bench_session_memory.py
+    python benchmarks/bench_session_memory.py --sessions 500 --results 10
+
+各セッションが検索結果（既定10件）を保持している状態を、次の3つの表現で比較する。
+
+- record: PaperRecord（アプリが使う項目だけを__slots__で保持）
+- dict: 同じ項目を持つ辞書
+- dict+raw: 従来の辞書（categoriesと、上流APIの生の応答 raw_data を含む。arXivはarxiv.Resultの代わりにその辞書形式）
+
+共有キャッシュから読み込むたびに結果は別のオブジェクトになるため、各セッションの結果はJSONから復元して作る。
+検索はローカルスタブ（benchmarks/stubs.py）に向けて行うため、ネットワークは不要。
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+QUERIES = {'arXiv': 'crispr base editing', 'bioRxiv': 'type 2 interneurons', 'PubMed': 'crispr base editing'}
+SOURCES = tuple(QUERIES)
+
+
+def fetch_results(results: int) -> Dict[str, Dict[str, List]]:
+    """各ソースから1ページ分を検索し、PaperRecordと従来の辞書（raw_data付き）の両方を返す"""
+    from stubs import StubHTTPServer
+    from research_paper_assistant import paper_sources
+    from research_paper_assistant.paper_sources import ArxivSource, BiorxivSource, PubmedSource
+
+    # 従来の辞書を組み立てるため、生の応答をレコードの生成時に捕まえる
+    paper_sources.KEEP_RAW_RESULTS = True
+    server = StubHTTPServer().start()
+    sources = {'arXiv': ArxivSource(), 'bioRxiv': BiorxivSource(), 'PubMed': PubmedSource()}
+    server.configure_sources(sources)
+
+    fetched = {}
+    for name, source in sources.items():
+        legacy = []
+        make_record = source._make_record
+
+        def capture(raw, make_record=make_record, legacy=legacy, **fields):
+            record = make_record(raw, **fields)
+            legacy.append({**record.to_dict(), 'categories': raw.get('categories') or [record.primary_category],
+                           'raw_data': raw})
+            return record
+
+        source._make_record = capture
+        records, _ = source.search_page(QUERIES[name], results)
+        fetched[name] = {'record': records, 'dict': [record.to_dict() for record in records], 'dict+raw': legacy}
+    server.stop()
+    return fetched
+
+
+def measure(sessions: int, make_session: Callable[[int], List]) -> int:
+    """sessions個のセッション分の結果を保持したときの増加メモリ（バイト）"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    held = [make_session(i) for i in range(sessions)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del held
+    return used
+
+
+def serialization(papers: List, dumps: Callable, loads: Callable, repeat: int = 200) -> Dict:
+    data = dumps(papers)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        loads(dumps(papers))
+    return {'bytes': len(data), 'us': (time.perf_counter() - start) / repeat * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=200, help='同時に保持するセッション数')
+    parser.add_argument('--results', type=int, default=10, help='セッションごとの検索結果の件数')
+    args = parser.parse_args()
+
+    os.environ['PAPER_ASSISTANT_CACHE_DIR'] = tempfile.mkdtemp(prefix='paper_assistant_bench_')
+    for api in ('ARXIV', 'BIORXIV', 'NCBI'):
+        os.environ[f'{api}_RATE_LIMIT'] = '1000000'
+    from research_paper_assistant.paper_record import PaperRecord
+
+    fetched = fetch_results(args.results)
+
+    loaders = {
+        'record': (lambda papers: json.dumps([paper.to_tuple() for paper in papers]),
+                   lambda data: [PaperRecord(*paper) for paper in json.loads(data)]),
+        'dict': (json.dumps, json.loads),
+        'dict+raw': (lambda papers: json.dumps(papers, default=str), json.loads),
+    }
+    print(f"memory per session ({args.results} results, {args.sessions} sessions)")
+    for kind, (dumps, loads) in loaders.items():
+        # ソースを順に割り当て、各セッションは独立したオブジェクトを持つ
+        serialized = [dumps(fetched[name][kind]) for name in SOURCES]
+        used = measure(args.sessions, lambda i: loads(serialized[i % len(SOURCES)]))
+        print(f"  {kind:10s} {used / args.sessions / 1024:8.1f} KiB")
+
+    print("serialization of one page (dump + load)")
+    for name in SOURCES:
+        records = fetched[name]['record']
+        dicts = fetched[name]['dict']
+        cases = {
+            'record json': serialization(records, lambda p: json.dumps([r.to_tuple() for r in p]),
+                                         lambda s: [PaperRecord(*r) for r in json.loads(s)]),
+            'dict json': serialization(dicts, json.dumps, json.loads),
+            'record pickle': serialization(records, pickle.dumps, pickle.loads),
+            'dict pickle': serialization(dicts, pickle.dumps, pickle.loads),
+        }
+        for case, result in cases.items():
+            print(f"  {name:8s} {case:14s} {result['bytes']:7d} bytes {result['us']:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
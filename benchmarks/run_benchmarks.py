@@ -0,0 +1,294 @@
+"""オフラインのベンチマークスイート
+
+実際のサービスには接続せず、benchmarks/stubs.py のローカルスタブ（arXiv・bioRxiv・PubMed・
+Bedrock Runtime）に対してホットパスを計測し、レイテンシのパーセンタイル・スループット・
+ピークメモリを表示する。結果はベースライン（benchmarks/baseline.json）と比較し、
+許容範囲を超えて悪化したケースがあれば終了コード1を返す。
+
+使い方:
+    python benchmarks/run_benchmarks.py                      # 計測してベースラインと比較
+    python benchmarks/run_benchmarks.py --save-baseline      # 現在の結果をベースラインとして保存
+    python benchmarks/run_benchmarks.py --latency 0.05 --throttle-rate 0.1 --only pubmed
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def prepare_environment(real_rate_limits: bool):
+    """キャッシュを一時ディレクトリに向け、スタブ用の環境変数を設定（パッケージのインポート前に呼ぶ）"""
+    os.environ['PAPER_ASSISTANT_CACHE_DIR'] = tempfile.mkdtemp(prefix='paper_assistant_bench_')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_CLAUDE_MODEL_ID', 'stub-model')
+    if not real_rate_limits:
+        for api in ('ARXIV', 'BIORXIV', 'NCBI'):
+            os.environ[f'{api}_RATE_LIMIT'] = '1000000'
+
+
+class Case:
+    def __init__(self, name: str, fn: Callable[[], object], iterations: int):
+        self.name = name
+        self.fn = fn
+        self.iterations = iterations
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_case(case: Case, scale: float) -> Dict:
+    iterations = max(1, int(case.iterations * scale))
+    case.fn()  # ウォームアップ
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        case.fn()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - start
+
+    # tracemallocは処理を遅くするため、時間計測とは別に1回だけ実行してピークを取る
+    tracemalloc.start()
+    case.fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'throughput_per_s': iterations / elapsed,
+        'peak_kib': peak / 1024,
+    }
+
+
+def build_cases(server, bedrock_runtime, bedrock_concurrency: float) -> List[Case]:
+    from research_paper_assistant.bedrock_client import AdaptiveLimiter, BedrockClient
+    from research_paper_assistant.chat_session import ChatSession
+    from research_paper_assistant.jats_extractor import extract_text
+    from research_paper_assistant.latex_extractor import extract_latex_text, unpack_source
+    from research_paper_assistant.number_converter import NumberConverter
+    from research_paper_assistant.paper_summarizer import PaperSummarizer, split_chunks
+    from research_paper_assistant.paper_sources import ArxivSource, BiorxivSource, PubmedSource
+    from research_paper_assistant.query_matcher import QueryMatcher
+    from research_paper_assistant.related_index import RelatedIndex
+    from research_paper_assistant.search_cache import SearchCache
+    from stubs import FIXTURES, render
+
+    sources = {'arXiv': ArxivSource(), 'bioRxiv': BiorxivSource(), 'PubMed': PubmedSource()}
+    server.configure_sources(sources)
+    arxiv_source, biorxiv_source, pubmed_source = sources['arXiv'], sources['bioRxiv'], sources['PubMed']
+
+    # bioRxivのフィルタ処理はHTTPを除いて計測するため、取得済みのページを使う
+    recent_page = biorxiv_source._fetch_details_page('2024-01-01', '2024-01-31', 0)
+    biorxiv_filter = BiorxivSource()
+    biorxiv_filter._fetch_details_page = lambda start, end, cursor: recent_page
+
+    # 検索語の照合: 数千件のタイトル・アブストラクトに対し、論文・項目ごとに変換する従来の方法と比較
+    records = [json.loads(render(server.biorxiv_record, index=i, day=1 + i % 28)) for i in range(5000)]
+
+    def per_paper_filter(query: str):
+        def matches_query(text: str, q: str) -> bool:
+            if NumberConverter.contains_number(q):
+                return NumberConverter.is_number_match(text, q)
+            return q.lower() in text.lower()
+        return [r for r in records if matches_query(r['title'], query) or matches_query(r['abstract'], query)]
+
+    # 検索結果キャッシュ: 同じ検索語（表記ゆれを含む）の2回目以降の検索（1回目はウォームアップで保存される）
+    search_cache = SearchCache()
+
+    # 関連論文: 取得済みの2000件から近い論文を探す（追加は反復ごとに未登録の論文）
+    related_papers = [{'id': r['doi'], 'source': 'bioRxiv', 'title': r['title'], 'summary': r['abstract'],
+                       'authors': r['authors'], 'pdf_url': '', 'published': r['date'], 'primary_category': r['category']}
+                      for r in records]
+    related_index = RelatedIndex(Path(os.environ['PAPER_ASSISTANT_CACHE_DIR']) / 'related_index_bench')
+    for related_paper in related_papers[:2000]:
+        related_index.add(related_paper)
+    unindexed = iter(related_papers[2000:])
+
+    # ローカルインデックスはスタブからの収集で構築
+    biorxiv_source.harvester.sync()
+
+    jats = (FIXTURES / 'pmc_article.xml').read_bytes()
+    eprint = server.arxiv_eprint
+
+    # 本文キャッシュに当たらないよう、反復ごとに別のIDで取得する
+    arxiv_ids = itertools.count()
+
+    def arxiv_full_text(eprint_format: str):
+        server.config.eprint_format = eprint_format
+        paper = {'id': f"2401.{next(arxiv_ids):05d}v1", 'title': 'Scaling Laws', 'summary': 'We study scaling laws.'}
+        return arxiv_source.get_full_text(paper)
+
+    paper = {
+        'id': '2401.00001', 'title': 'Scaling Laws for Neural Language Models',
+        'authors': 'Jared Kaplan, Sam McCandlish', 'summary': 'We study empirical scaling laws. ' * 20,
+        'primary_category': 'cs.LG', 'source': 'arXiv',
+    }
+    chat = ChatSession(paper)
+    for i in range(10):
+        chat.add_message('user', f"質問{i}: この論文の手法について詳しく教えてください。" * 3)
+        chat.add_message('assistant', "回答: モデルサイズとデータ量に対してべき乗則が成り立ちます。" * 20)
+
+    system, messages = chat.build_request(chat.recent_turns(), '新しい質問: 主な結果は？', '論文について回答してください。',
+                                          '\n\n'.join([extract_text(jats)] * 8))
+
+    # 同時実行数の上限はケース間で引き継がれるよう、ベンチマーク用のリミッターを共有する
+    bedrock = BedrockClient(max_retries=3, retry_delay=0.01, limiter=AdaptiveLimiter(maximum=bedrock_concurrency))
+    bedrock.client = bedrock_runtime
+
+    async def invoke_concurrently(count: int):
+        return await asyncio.gather(*(bedrock.ainvoke_model(f"Summarize paper {i}.", max_tokens=512)
+                                      for i in range(count)))
+
+    # 論文全体の要約: 部分要約の並列生成と、1並列の場合との比較（LLMキャッシュに当たらないよう反復ごとに別の論文）
+    # 約1.5万トークンの本文（チャンクの内容が重複してキャッシュに当たらないよう、節ごとに見出しを変える）
+    long_text = '\n\n'.join(extract_text(jats).replace('Section: ', f"Section: {i}. ") for i in range(40))
+    summary_ids = itertools.count()
+    summarizer = PaperSummarizer(bedrock)
+    sequential_summarizer = PaperSummarizer(bedrock)
+    sequential_summarizer.executor = ThreadPoolExecutor(max_workers=1)
+
+    def summarize_new_paper(target: PaperSummarizer):
+        return target.summarize({**paper, 'title': f"{paper['title']} ({next(summary_ids)})"}, long_text)
+
+    print(f"summary chunks: {len(split_chunks(long_text))}")
+
+    return [
+        Case('arxiv.prepare_query', lambda: arxiv_source.prepare_query('covid 19 type ii diabetes machine learning'), 2000),
+        Case('arxiv.search', lambda: arxiv_source.search('neural scaling laws', 10), 20),
+        Case('biorxiv.filter_number', lambda: biorxiv_filter._search_recent('type 2 interneurons', 100, max_pages=1), 200),
+        Case('biorxiv.filter_text', lambda: biorxiv_filter._search_recent('zebrafish regeneration', 100, max_pages=1), 200),
+        Case('query.per_paper_number', lambda: per_paper_filter('type 2 interneurons'), 20),
+        Case('query.compiled_number', lambda: QueryMatcher('type 2 interneurons').filter(records), 20),
+        Case('query.per_paper_text', lambda: per_paper_filter('zebrafish regeneration'), 20),
+        Case('query.compiled_text', lambda: QueryMatcher('zebrafish regeneration').filter(records), 20),
+        Case('related.add', lambda: related_index.add(next(unindexed)), 200),
+        Case('related.query', lambda: related_index.related(related_papers[0]), 200),
+        Case('biorxiv.index_search', lambda: biorxiv_source.index.search('type 2 interneurons', 10), 200),
+        Case('pubmed.search', lambda: pubmed_source.search('crispr base editing', 10), 20),
+        Case('pubmed.search_cached', lambda: search_cache.get_or_search(
+            'PubMed', search_cache.make_key('PubMed', 'crispr  Base editing', 10),
+            lambda: pubmed_source.search_page('crispr base editing', 10)), 200),
+        # 5ページ分を順に読み込む（「さらに読み込む」を4回押した場合）
+        Case('pubmed.search_pages', lambda: list(itertools.islice(
+            pubmed_source.search_pages('crispr base editing', 10), 5)), 10),
+        Case('arxiv.search_pages', lambda: list(itertools.islice(
+            arxiv_source.search_pages('neural scaling laws', 10), 5)), 10),
+        Case('arxiv.full_text_latex', lambda: arxiv_full_text('latex'), 50),
+        Case('arxiv.full_text_pdf', lambda: arxiv_full_text('pdf'), 20),
+        Case('extract_text', lambda: extract_text(jats), 200),
+        Case('latex_extract', lambda: extract_latex_text(unpack_source(eprint)), 200),
+        Case('summary.map_reduce', lambda: summarize_new_paper(summarizer), 5),
+        Case('summary.map_reduce_sequential', lambda: summarize_new_paper(sequential_summarizer), 5),
+        # 出力言語を切り替えた場合: 部分要約はすべてキャッシュから読み込まれる
+        Case('summary.switch_language_prompt', lambda: summarizer.build_prompt(paper, long_text, 'English'), 20),
+        Case('chat.get_context_for_prompt', chat.get_context_for_prompt, 2000),
+        Case('bedrock.invoke_model', lambda: bedrock.invoke_model('Summarize this paper.', max_tokens=512), 20),
+        Case('bedrock.ainvoke_concurrent16', lambda: asyncio.run(invoke_concurrently(16)), 5),
+        Case('bedrock.invoke_model_stream', lambda: ''.join(bedrock.invoke_model_stream('Summarize this paper.')), 20),
+        Case('bedrock.chat_with_cached_paper',
+             lambda: bedrock.invoke_model(system=system, messages=messages, max_tokens=512), 20),
+    ]
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """p50レイテンシとピークメモリがベースラインより許容範囲以上悪化したケースを返す"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ('p50_ms', 'peak_kib'):
+            if base[metric] > 0 and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {base[metric]:.2f} -> {result[metric]:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--only', help='名前にこの文字列を含むケースのみ実行')
+    parser.add_argument('--scale', type=float, default=1.0, help='各ケースの反復回数の倍率')
+    parser.add_argument('--latency', type=float, default=0.0, help='スタブの応答遅延（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0, help='スタブの遅延に加える乱数の幅（秒）')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='スタブがスロットリングを返す確率')
+    parser.add_argument('--bedrock-concurrency', type=float, default=16.0,
+                        help='Bedrockの同時実行数の上限（スロットリングがなければAIMDでここまで増える）')
+    parser.add_argument('--real-rate-limits', action='store_true', help='APIごとの本番のレート制限を適用')
+    parser.add_argument('--metrics', action='store_true', help='計測を有効にして実行し、最後に集計を表示')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='悪化とみなす割合')
+    parser.add_argument('--json', type=Path, help='結果をJSONで保存するパス')
+    args = parser.parse_args()
+
+    prepare_environment(args.real_rate_limits)
+    from stubs import StubBedrockRuntime, StubConfig, StubHTTPServer
+    from research_paper_assistant import metrics
+    metrics.configure(args.metrics)
+
+    config = StubConfig(latency=args.latency, jitter=args.jitter, throttle_rate=args.throttle_rate)
+    server = StubHTTPServer(config).start()
+    try:
+        cases = build_cases(server, StubBedrockRuntime(config), args.bedrock_concurrency)
+        if args.only:
+            cases = [case for case in cases if args.only in case.name]
+
+        results = {}
+        print(f"{'case':30s} {'p50 ms':>9s} {'p90 ms':>9s} {'p99 ms':>9s} {'ops/s':>10s} {'peak KiB':>10s}")
+        for case in cases:
+            result = run_case(case, args.scale)
+            results[case.name] = result
+            print(f"{case.name:30s} {result['p50_ms']:9.2f} {result['p90_ms']:9.2f} {result['p99_ms']:9.2f} "
+                  f"{result['throughput_per_s']:10.1f} {result['peak_kib']:10.1f}")
+        print(f"stub HTTP requests: {server.requests}")
+        from research_paper_assistant.bedrock_client import get_usage_totals
+        print(f"Bedrock tokens: {get_usage_totals()}")
+        if args.metrics:
+            print('\n' + '\n'.join(line for line in metrics.registry.render().splitlines() if '_bucket' not in line))
+    finally:
+        server.stop()
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        print(f"baseline saved to {args.baseline}")
+        return
+
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nno regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,463 @@
+"""ベンチマーク用のローカルスタブ（arXiv・bioRxiv・PubMedのHTTP API、Bedrock Runtime）
+
+記録済みのフィクスチャ（benchmarks/fixtures）をテンプレートとして、リクエストされた
+件数・IDに合わせた応答を返す。遅延とスロットリング（HTTP 429 / ThrottlingException）を設定できる。
+"""
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from botocore.exceptions import ClientError
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+
+_PLACEHOLDER = re.compile(r'\{(\w+)(?::([^}]*))?\}')
+
+
+def render(template: str, **values) -> str:
+    """テンプレート中の {name} / {name:05d} を置換（JSONの波括弧はそのまま残す）"""
+    def replace(match):
+        name, spec = match.group(1), match.group(2) or ''
+        if name not in values:
+            return match.group(0)
+        return format(values[name], spec)
+    return _PLACEHOLDER.sub(replace, template)
+
+
+def load_fixture(name: str) -> str:
+    return (FIXTURES / name).read_text(encoding='utf-8')
+
+
+def make_eprint_tarball(directory: Path = FIXTURES / 'arxiv_eprint') -> bytes:
+    """ディレクトリ内のTeXソースを、arXivのe-printと同じgzip圧縮のtarにまとめる"""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for path in sorted(directory.rglob('*')):
+            if path.is_file():
+                archive.add(path, arcname=str(path.relative_to(directory)))
+    return buffer.getvalue()
+
+
+PDF_PAGE_LINES = [
+    '{number} Section {page}',
+    'Performance depends most strongly on scale, which consists of three fac-',
+    'tors: the number of model parameters, the size of the dataset, and the',
+    'amount of compute used for training on page {page}.',
+    'Large models are significantly more sample-efficient than small models.',
+]
+
+
+def make_pdf(pages: int) -> bytes:
+    """見出しと本文を含む各ページからなる最小限のPDF（テキスト抽出のベンチマーク用）"""
+    objects = ['<< /Type /Catalog /Pages 2 0 R >>', None,
+               '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    kids = []
+    for page in range(pages):
+        lines = [line.format(number=page + 1, page=page + 1) for line in PDF_PAGE_LINES]
+        if page == pages - 1:
+            lines += ['References', '[1] J. Kaplan et al. Scaling laws. 2020.']
+        text = ' '.join(f"({line}) Tj 0 -14 Td" for line in lines)
+        stream = f"BT /F1 11 Tf 72 720 Td {text} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = io.BytesIO()
+    out.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{obj}\nendobj\n".encode('latin-1'))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1'))
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode('latin-1'))
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1'))
+    return out.getvalue()
+
+
+@dataclass
+class StubConfig:
+    latency: float = 0.0         # 応答ごとの遅延（秒）
+    jitter: float = 0.0          # 遅延に加える一様乱数の幅（秒）
+    throttle_rate: float = 0.0   # HTTP 429 / ThrottlingException を返す確率
+    total_results: int = 500     # 検索結果の総件数
+    eprint_format: str = 'latex'  # arXivのe-print: 'latex'（tar.gz）・'pdf'（PDFのみの投稿）・'missing'（404）
+    pdf_pages: int = 24          # arXivのPDFのページ数
+    seed: int = 0
+
+    def delay(self, rng: random.Random):
+        if self.latency or self.jitter:
+            time.sleep(self.latency + rng.uniform(0, self.jitter))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: 'StubHTTPServer'
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # ヘッダーと本文の分割送信で遅延ACK待ちが発生しないように
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self._dispatch(parse_qs(self.rfile.read(length).decode('utf-8')))
+
+    def do_GET(self):
+        self._dispatch(parse_qs(urlparse(self.path).query))
+
+    def _dispatch(self, params: Dict):
+        stub = self.server
+        stub.count_request()
+        stub.config.delay(stub.rng)
+        if stub.rng.random() < stub.config.throttle_rate:
+            self._send(429, b'Too Many Requests', 'text/plain')
+            return
+
+        path = urlparse(self.path).path
+        for prefix, handler in stub.routes:
+            if path.startswith(prefix):
+                status, body, content_type = handler(path[len(prefix):], params)
+                self._send(status, body, content_type)
+                return
+        self._send(404, b'Not Found', 'text/plain')
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    """arXiv・bioRxiv・NCBI E-utilitiesを模したローカルHTTPサーバー"""
+
+    daemon_threads = True
+
+    def __init__(self, config: Optional[StubConfig] = None):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.config = config or StubConfig()
+        self.rng = random.Random(self.config.seed)
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.routes = [
+            ('/arxiv/api/query', self._arxiv_query),
+            ('/arxiv/e-print/', self._arxiv_eprint),
+            ('/arxiv/pdf/', self._arxiv_pdf),
+            ('/biorxiv/details/biorxiv/', self._biorxiv_details),
+            ('/biorxiv/content/', self._biorxiv_content),
+            ('/eutils/esearch.fcgi', self._esearch),
+            ('/eutils/esummary.fcgi', self._esummary),
+            ('/eutils/efetch.fcgi', self._efetch),
+            ('/eutils/elink.fcgi', self._elink),
+        ]
+        self.arxiv_feed = load_fixture('arxiv_feed.xml')
+        self.arxiv_entry = load_fixture('arxiv_entry.xml')
+        self.biorxiv_record = load_fixture('biorxiv_record.json')
+        self.esummary_record = load_fixture('pubmed_esummary_record.json')
+        self.efetch_article = load_fixture('pubmed_efetch_article.xml')
+        self.jats_article = (FIXTURES / 'pmc_article.xml').read_bytes()
+        self.arxiv_eprint = make_eprint_tarball()
+        self._arxiv_pdfs: Dict[int, bytes] = {}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self) -> 'StubHTTPServer':
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def configure_sources(self, sources: Dict):
+        """論文ソースの接続先をこのスタブに向ける"""
+        if 'arXiv' in sources:
+            sources['arXiv'].client.query_url_format = f"{self.url}/arxiv/api/query?{{}}"
+            sources['arXiv'].eprint_url = f"{self.url}/arxiv/e-print"
+            sources['arXiv'].pdf_url = f"{self.url}/arxiv/pdf"
+        if 'bioRxiv' in sources:
+            sources['bioRxiv'].base_url = f"{self.url}/biorxiv/details/biorxiv"
+            sources['bioRxiv'].content_url = f"{self.url}/biorxiv/content"
+        if 'PubMed' in sources:
+            sources['PubMed'].base_url = f"{self.url}/eutils"
+
+    # --- arXiv ---
+    def _arxiv_query(self, _, params):
+        start = int(params.get('start', ['0'])[0])
+        count = max(0, min(int(params.get('max_results', ['10'])[0]), self.config.total_results - start))
+        entries = ''.join(render(self.arxiv_entry, index=start + i) for i in range(count))
+        body = render(self.arxiv_feed, total=self.config.total_results, start=start, count=count, entries=entries)
+        return 200, body.encode('utf-8'), 'application/atom+xml'
+
+    def _pdf(self) -> bytes:
+        pages = self.config.pdf_pages
+        if pages not in self._arxiv_pdfs:
+            self._arxiv_pdfs[pages] = make_pdf(pages)
+        return self._arxiv_pdfs[pages]
+
+    def _arxiv_eprint(self, _, __):
+        if self.config.eprint_format == 'pdf':
+            return 200, self._pdf(), 'application/pdf'
+        if self.config.eprint_format == 'missing':
+            return 404, b'Not Found', 'text/plain'
+        return 200, self.arxiv_eprint, 'application/x-eprint-tar'
+
+    def _arxiv_pdf(self, _, __):
+        return 200, self._pdf(), 'application/pdf'
+
+    # --- bioRxiv ---
+    def _biorxiv_details(self, rest, _):
+        parts = rest.strip('/').split('/')
+        cursor = int(parts[2]) if len(parts) > 2 else 0
+        count = max(0, min(100, self.config.total_results - cursor))
+        collection = [json.loads(render(self.biorxiv_record, index=cursor + i, day=1 + (cursor + i) % 28))
+                      for i in range(count)]
+        body = {
+            'messages': [{'status': 'ok', 'cursor': cursor, 'count': count, 'total': self.config.total_results}],
+            'collection': collection
+        }
+        return 200, json.dumps(body).encode('utf-8'), 'application/json'
+
+    def _biorxiv_content(self, _, __):
+        return 200, self.jats_article, 'application/xml'
+
+    # --- NCBI E-utilities ---
+    @staticmethod
+    def _ids(params) -> list:
+        ids = []
+        for value in params.get('id', []):
+            ids.extend(v for v in value.split(',') if v)
+        return ids
+
+    def _history_ids(self, params) -> list:
+        ids = self._ids(params)
+        if ids:
+            return ids
+        start = int(params.get('retstart', ['0'])[0])
+        count = int(params.get('retmax', ['20'])[0])
+        return [str(30000000 + i) for i in range(start, start + count)]
+
+    def _esearch(self, _, params):
+        start = int(params.get('retstart', ['0'])[0])
+        count = max(0, min(int(params.get('retmax', ['20'])[0]), self.config.total_results - start))
+        result = {
+            'count': str(self.config.total_results),
+            'retmax': str(count),
+            'retstart': str(start),
+            'idlist': [str(30000000 + i) for i in range(start, start + count)],
+        }
+        return 200, json.dumps({'esearchresult': result}).encode('utf-8'), 'application/json'
+
+    def _esummary(self, _, params):
+        ids = self._history_ids(params)
+        result = {'uids': ids}
+        for pmid in ids:
+            result[pmid] = json.loads(render(self.esummary_record, pmid=pmid, pmcid=int(pmid) % 1000000))
+        return 200, json.dumps({'result': result}).encode('utf-8'), 'application/json'
+
+    def _efetch(self, _, params):
+        if params.get('db', [''])[0] == 'pmc':
+            return 200, self.jats_article, 'application/xml'
+        articles = ''.join(render(self.efetch_article, pmid=pmid) for pmid in self._history_ids(params))
+        body = f'<?xml version="1.0"?><PubmedArticleSet>{articles}</PubmedArticleSet>'
+        return 200, body.encode('utf-8'), 'application/xml'
+
+    def _elink(self, _, params):
+        linksets = []
+        for pmid in self._ids(params):
+            linksets.append({
+                'dbfrom': 'pubmed',
+                'ids': [pmid],
+                'linksetdbs': [{'dbto': 'pmc', 'linkname': 'pubmed_pmc', 'links': [str(int(pmid) % 1000000)]}]
+            })
+        return 200, json.dumps({'linksets': linksets}).encode('utf-8'), 'application/json'
+
+
+MAX_CACHE_BREAKPOINTS = 4
+CACHE_MIN_TOKENS = 1024
+
+
+def validate_messages_request(request: Dict) -> List[str]:
+    """Bedrock上のAnthropic Messages APIのリクエスト形式を検証し、問題点を返す"""
+    problems = []
+    if request.get('anthropic_version') != 'bedrock-2023-05-31':
+        problems.append('anthropic_version must be bedrock-2023-05-31')
+    if not isinstance(request.get('max_tokens'), int) or request['max_tokens'] <= 0:
+        problems.append('max_tokens must be a positive integer')
+
+    breakpoints = 0
+
+    def check_blocks(blocks, where: str):
+        nonlocal breakpoints
+        if isinstance(blocks, str):
+            return
+        if not isinstance(blocks, list) or not blocks:
+            problems.append(f'{where} must be a string or a non-empty list of content blocks')
+            return
+        for block in blocks:
+            if block.get('type') != 'text' or not isinstance(block.get('text'), str) or not block['text']:
+                problems.append(f'{where} blocks must be non-empty text blocks')
+            cache_control = block.get('cache_control')
+            if cache_control is not None:
+                breakpoints += 1
+                if cache_control != {'type': 'ephemeral'}:
+                    problems.append(f'{where}: unsupported cache_control {cache_control}')
+            extra = set(block) - {'type', 'text', 'cache_control'}
+            if extra:
+                problems.append(f'{where}: unexpected fields {sorted(extra)}')
+
+    if 'system' in request:
+        check_blocks(request['system'], 'system')
+
+    messages = request.get('messages')
+    if not isinstance(messages, list) or not messages:
+        problems.append('messages must be a non-empty list')
+        messages = []
+    for i, message in enumerate(messages):
+        expected = 'user' if i % 2 == 0 else 'assistant'
+        if message.get('role') != expected:
+            problems.append(f'messages[{i}].role must be {expected} (roles must alternate, starting with user)')
+        check_blocks(message.get('content'), f'messages[{i}].content')
+    if messages and messages[-1].get('role') != 'user':
+        problems.append('the last message must be from the user')
+
+    if breakpoints > MAX_CACHE_BREAKPOINTS:
+        problems.append(f'at most {MAX_CACHE_BREAKPOINTS} cache_control blocks are allowed')
+    return problems
+
+
+class StubBedrockRuntime:
+    """boto3のbedrock-runtimeクライアントの代わりに使うスタブ
+
+    invoke_model / invoke_model_with_response_stream に対して、設定した遅延・生成速度で
+    Messages API形式の応答を返し、一定の確率で ThrottlingException を送出する。
+    リクエスト形式が不正な場合は ValidationException を送出し、cache_control の付いた
+    接頭部分はプロンプトキャッシュとして扱って cache_read / cache_creation のトークン数を返す。
+    """
+
+    def __init__(self, config: Optional[StubConfig] = None, output_tokens: int = 200,
+                 tokens_per_second: float = 2000.0, time_to_first_token: float = 0.0):
+        self.config = config or StubConfig()
+        self.rng = random.Random(self.config.seed)
+        self.output_tokens = output_tokens
+        self.tokens_per_second = tokens_per_second
+        self.time_to_first_token = time_to_first_token
+        self.calls = 0
+        self.requests = []  # 受け取ったリクエストボディ（形式の検証用）
+        self.prompt_cache = set()  # キャッシュ済みの接頭部分
+        self._lock = threading.Lock()
+
+    def _begin(self, body: bytes) -> Dict:
+        with self._lock:
+            self.calls += 1
+            request = json.loads(body)
+            self.requests.append(request)
+        problems = validate_messages_request(request)
+        if problems:
+            raise ClientError(
+                {'Error': {'Code': 'ValidationException', 'Message': '; '.join(problems)},
+                 'ResponseMetadata': {'HTTPStatusCode': 400}},
+                'InvokeModel'
+            )
+        self.config.delay(self.rng)
+        if self.rng.random() < self.config.throttle_rate:
+            raise ClientError(
+                {'Error': {'Code': 'ThrottlingException', 'Message': 'Too many requests'},
+                 'ResponseMetadata': {'HTTPStatusCode': 429}},
+                'InvokeModel'
+            )
+        return request
+
+    @staticmethod
+    def _tokens(value) -> int:
+        return len(json.dumps(value, ensure_ascii=False)) // 4
+
+    def _usage(self, request: Dict) -> Dict:
+        """入力を、最後のcache_controlまでの接頭部分とそれ以降に分けてトークン数を数える"""
+        system = request.get('system') or []
+        if isinstance(system, str):
+            system = [{'type': 'text', 'text': system}]
+        blocks = list(system)
+        for message in request.get('messages', []):
+            content = message.get('content')
+            blocks.extend([{'type': 'text', 'text': content}] if isinstance(content, str) else content)
+
+        cut = max((i + 1 for i, block in enumerate(blocks) if block.get('cache_control')), default=0)
+        prefix_tokens = self._tokens(blocks[:cut]) if cut else 0
+        usage = {
+            'input_tokens': self._tokens(blocks[cut:]),
+            'output_tokens': self.output_tokens,
+            'cache_read_input_tokens': 0,
+            'cache_creation_input_tokens': 0,
+        }
+        if prefix_tokens < CACHE_MIN_TOKENS:
+            usage['input_tokens'] += prefix_tokens
+            return usage
+
+        key = json.dumps(blocks[:cut], sort_keys=True)
+        with self._lock:
+            hit = key in self.prompt_cache
+            self.prompt_cache.add(key)
+        usage['cache_read_input_tokens' if hit else 'cache_creation_input_tokens'] = prefix_tokens
+        return usage
+
+    def _words(self) -> Iterator[str]:
+        for i in range(self.output_tokens):
+            yield f"token{i} "
+
+    def invoke_model(self, modelId: str = None, body: bytes = b'', **kwargs) -> Dict:
+        request = self._begin(body)
+        time.sleep(self.time_to_first_token + self.output_tokens / self.tokens_per_second)
+        response = {
+            'id': f"msg_stub_{self.calls}",
+            'type': 'message',
+            'role': 'assistant',
+            'content': [{'type': 'text', 'text': ''.join(self._words())}],
+            'stop_reason': 'end_turn',
+            'usage': self._usage(request),
+        }
+        return {'body': io.BytesIO(json.dumps(response).encode('utf-8'))}
+
+    def invoke_model_with_response_stream(self, modelId: str = None, body: bytes = b'', **kwargs) -> Dict:
+        request = self._begin(body)
+        usage = self._usage(request)
+
+        def event(payload: Dict) -> Dict:
+            return {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+        def events():
+            time.sleep(self.time_to_first_token)
+            start_usage = {key: value for key, value in usage.items() if key != 'output_tokens'}
+            yield event({'type': 'message_start', 'message': {'usage': start_usage}})
+            yield event({'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+            for word in self._words():
+                time.sleep(1 / self.tokens_per_second)
+                yield event({'type': 'content_block_delta', 'index': 0, 'delta': {'type': 'text_delta', 'text': word}})
+            yield event({'type': 'content_block_stop', 'index': 0})
+            yield event({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'},
+                         'usage': {'output_tokens': usage['output_tokens']}})
+            yield event({'type': 'message_stop'})
+
+        return {'body': events()}
@@ -0,0 +1,96 @@
+import multiprocessing
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_process_pools: Dict[str, ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """用途ごとにプロセス全体で共有される、上限付きのワーカープール"""
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        return _executors[name]
+
+
+def get_process_pool(name: str, max_workers: int) -> ProcessPoolExecutor:
+    """CPU負荷の高い処理（PDFの解析など）用に共有されるプロセスプール（Streamlitのスレッドからも安全なspawnで起動）"""
+    with _executors_lock:
+        if name not in _process_pools:
+            _process_pools[name] = ProcessPoolExecutor(max_workers=max_workers,
+                                                       mp_context=multiprocessing.get_context('spawn'))
+        return _process_pools[name]
+
+
+def reset_process_pool(name: str):
+    """ワーカーの異常終了などで壊れたプールを破棄（次回のget_process_poolで作り直す）"""
+    with _executors_lock:
+        pool = _process_pools.pop(name, None)
+    if pool is not None:
+        # 壊れたプールの未完了のジョブは既に失敗しているため、完了を待たずに閉じるだけでよい
+        pool.shutdown(wait=False)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobGroup:
+    """1回の検索に属するバックグラウンドジョブ群（新しい検索でまとめてキャンセルする）"""
+
+    def __init__(self, executor: ThreadPoolExecutor):
+        self.executor = executor
+        self.futures: Dict[str, Future] = {}
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        """長い処理の区切りで呼び、キャンセル済みなら中断する"""
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def submit(self, key: str, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        def run():
+            self.check_cancelled()
+            return fn(*args, **kwargs)
+
+        future = self.executor.submit(run)
+        self.futures[key] = future
+        return future
+
+    def status(self, key: str) -> Optional[str]:
+        """'pending'・'running'・'done'・'failed'・'cancelled' のいずれか（未登録ならNone）"""
+        future = self.futures.get(key)
+        if future is None:
+            return None
+        if future.cancelled():
+            return 'cancelled'
+        if not future.done():
+            return 'running' if future.running() else 'pending'
+        return 'failed' if future.exception() is not None else 'done'
+
+    def result(self, key: str, timeout: Optional[float] = 0) -> Optional[Any]:
+        """完了済みの結果を返す（timeoutまで待機、失敗・未完了ならNone）"""
+        future = self.futures.get(key)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=timeout)
+        except (CancelledError, JobCancelled, FutureTimeoutError):
+            return None
+        except Exception as e:
+            print(f"Background job {key} failed: {e}")
+            return None
+
+    def cancel(self):
+        """未開始のジョブを取り消し、実行中のジョブには中断を通知"""
+        self._cancelled.set()
+        for future in self.futures.values():
+            future.cancel()
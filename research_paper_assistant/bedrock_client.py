@@ -1,41 +1,236 @@
-import boto3
+import asyncio
+import functools
 import json
+import logging
+import random
+import threading
 import time
-from typing import Optional
-import streamlit as st
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Union
 import os
+from .llm_cache import get_llm_cache
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# プロセス全体の累計トークン数（プロンプトキャッシュの読み込み・書き込みを含む）
+USAGE_FIELDS = {
+    'input_tokens': 'input',
+    'output_tokens': 'output',
+    'cache_read_input_tokens': 'cache_read',
+    'cache_creation_input_tokens': 'cache_write',
+}
+_usage_totals = {direction: 0 for direction in USAGE_FIELDS.values()}
+_usage_lock = threading.Lock()
+
+
+def get_usage_totals() -> dict:
+    """このプロセスでの累計トークン数（input・output・cache_read・cache_write）"""
+    with _usage_lock:
+        return dict(_usage_totals)
+
+
+# 混雑を示すエラー（同時実行数の上限を下げ、スロットリングとして計測する。HTTP 429も同じ扱い）
+THROTTLE_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException'}
+# 再試行するエラー（それ以外のValidationExceptionやAccessDeniedExceptionなどは再試行しても成功しない）
+RETRYABLE_ERROR_CODES = THROTTLE_ERROR_CODES | {
+    'InternalServerException', 'ModelNotReadyException', 'ModelTimeoutException',
+}
+# 接続・タイムアウトのエラー（botocoreを読み込まずにクラス名で判定）
+RETRYABLE_EXCEPTION_NAMES = {
+    'EndpointConnectionError', 'ConnectionClosedError', 'ConnectTimeoutError', 'ReadTimeoutError',
+    'ConnectionError', 'TimeoutError',
+}
+# 再試行の待機時間の上限（秒）
+MAX_BACKOFF = 20.0
+
+
+def error_code(error: Exception) -> str:
+    """botocoreのClientErrorのエラーコード（それ以外は例外のクラス名）"""
+    response = getattr(error, 'response', None)
+    code = response.get('Error', {}).get('Code', '') if isinstance(response, dict) else ''
+    return code or type(error).__name__
+
+
+def _http_status(error: Exception) -> Optional[int]:
+    response = getattr(error, 'response', None)
+    return response.get('ResponseMetadata', {}).get('HTTPStatusCode') if isinstance(response, dict) else None
+
+
+def is_throttle(error: Exception) -> bool:
+    return error_code(error) in THROTTLE_ERROR_CODES or _http_status(error) == 429
+
+
+def _outcome(error: Exception) -> str:
+    return 'throttled' if is_throttle(error) else 'error'
+
+
+def is_retryable(error: Exception) -> bool:
+    code = error_code(error)
+    if code in RETRYABLE_ERROR_CODES or code in RETRYABLE_EXCEPTION_NAMES:
+        return True
+    return _http_status(error) in (429, 500, 502, 503, 504)
+
+
+@dataclass
+class BedrockEvent:
+    """再試行・失敗の通知（UIへの表示やログは受け取った側で行う）"""
+    kind: str  # 'retry' または 'error'
+    mode: str  # 'invoke' または 'stream'
+    code: str
+    message: str
+    attempt: int
+    delay: float = 0.0
+
+
+EventHandler = Callable[[BedrockEvent], None]
+
+
+def log_event(event: BedrockEvent):
+    """既定のイベントハンドラ（ログに出力するだけ）"""
+    if event.kind == 'retry':
+        logger.warning("Bedrock %s failed with %s, retrying in %.2fs (attempt %d)",
+                       event.mode, event.code, event.delay, event.attempt)
+    else:
+        logger.error("Bedrock %s failed with %s: %s", event.mode, event.code, event.message)
+
+
+class AdaptiveLimiter:
+    """AIMDで同時実行数の上限を調整するリミッター
+
+    成功するたびに上限を少しずつ（上限1つ分の成功でおよそ1）増やし、スロットリングされたら半分にする。
+    同時に実行中だった呼び出しがまとめてスロットリングされても、減らすのは1回だけにする。
+    """
+
+    def __init__(self, initial: float = 2.0, minimum: float = 1.0, maximum: float = 16.0):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """実行枠を取得できるまで待ち、取得した時刻を返す（releaseに渡す）"""
+        start = time.monotonic()
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            acquired = time.monotonic()
+        metrics.observe('bedrock_concurrency_wait_seconds', acquired - start)
+        return acquired
+
+    def release(self, acquired: float, outcome: str = 'ok'):
+        """実行枠を返し、結果（'ok'・'throttled'・'error'）に応じて上限を調整する"""
+        with self._condition:
+            self.in_flight -= 1
+            if outcome == 'ok':
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif outcome == 'throttled' and acquired >= self._last_decrease:
+                # この呼び出しの開始後に既に減らしていれば、同じ混雑によるものとみなす
+                self.limit = max(self.minimum, self.limit / 2)
+                self._last_decrease = time.monotonic()
+                metrics.incr('bedrock_concurrency_decreases_total')
+            self._condition.notify_all()
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_concurrency_limiter(name: str = 'bedrock') -> AdaptiveLimiter:
+    """プロセス全体で共有される同時実行数のリミッターを取得（BEDROCK_MAX_CONCURRENCYで上限を変更可能）"""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(maximum=float(os.getenv('BEDROCK_MAX_CONCURRENCY', 16)))
+        return _limiters[name]
+
 
 class BedrockClient:
-    def __init__(self, max_retries: int = 3, retry_delay: float = 1.0):
-        self.client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=os.getenv('AWS_DEFAULT_REGION'),
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-        )
+    """Bedrock RuntimeのMessages APIクライアント
+
+    同時実行数はプロセス全体で共有するAdaptiveLimiterで制御し、再試行できるエラーだけを
+    ジッター付きの指数バックオフで再試行する。Streamlitには依存せず、再試行・失敗は戻り値（None）と
+    イベント（on_event）で通知するため、バックグラウンドのワーカーやバッチ処理からも使える。
+    """
+
+    def __init__(self, max_retries: int = 3, retry_delay: float = 1.0,
+                 limiter: Optional[AdaptiveLimiter] = None, on_event: Optional[EventHandler] = None):
+        self._client = None
+        self._client_lock = threading.Lock()
         self.max_retries = max_retries
         self.retry_delay = retry_delay
-        self.last_request_time = 0
-        self.min_request_interval = 0.5  # 最小リクエスト間隔（秒）
-
-    def wait_if_needed(self):
-        """リクエスト間隔を制御"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last_request)
-        self.last_request_time = time.time()
-
-    def invoke_model(self, prompt: str, max_tokens: int = 4096) -> Optional[str]:
-        """Claudeモデルを呼び出し、必要に応じて再試行"""
-        request_body = {
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": max_tokens,
-            "top_k": 250,
-            "stop_sequences": [],
-            "temperature": 0.7,
-            "top_p": 0.999,
-            "messages": [
+        self.limiter = limiter or get_concurrency_limiter()
+        self.on_event = on_event or log_event
+
+    @property
+    def client(self):
+        """bedrock-runtimeクライアント（boto3の読み込みと認証情報の解決は最初の呼び出し時に一度だけ）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import boto3
+                    self._client = boto3.client(
+                        service_name='bedrock-runtime',
+                        region_name=os.getenv('AWS_DEFAULT_REGION'),
+                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
+                    )
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def _backoff(self, attempt: int) -> float:
+        """attempt回目の再試行までの待機時間（上限付き指数バックオフにフルジッターを掛ける）"""
+        return random.uniform(0, min(MAX_BACKOFF, self.retry_delay * (2 ** (attempt - 1))))
+
+    def _handle_failure(self, mode: str, error: Exception, attempt: int,
+                        on_event: Optional[EventHandler]) -> Optional[float]:
+        """失敗を記録・通知し、再試行する場合は待機秒数を返す"""
+        will_retry = attempt <= self.max_retries and is_retryable(error)
+        self._record_failure(mode, error, will_retry)
+        delay = self._backoff(attempt) if will_retry else 0.0
+        (on_event or self.on_event)(BedrockEvent('retry' if will_retry else 'error', mode, error_code(error),
+                                                 str(error), attempt, delay))
+        return delay if will_retry else None
+
+    @staticmethod
+    def _record_usage(mode: str, usage: Optional[dict], elapsed: float):
+        """呼び出し1回分のレイテンシとトークン数を記録"""
+        metrics.observe('bedrock_request_seconds', elapsed, mode=mode)
+        metrics.incr('bedrock_requests_total', mode=mode, status='ok')
+        usage = usage or {}
+        with _usage_lock:
+            for field, direction in USAGE_FIELDS.items():
+                _usage_totals[direction] += usage.get(field) or 0
+        for field, direction in USAGE_FIELDS.items():
+            metrics.incr('bedrock_tokens_total', usage.get(field) or 0, direction=direction)
+        if usage.get('cache_read_input_tokens') or usage.get('cache_creation_input_tokens'):
+            logger.info("Bedrock prompt cache: read %s, write %s tokens",
+                        usage.get('cache_read_input_tokens') or 0, usage.get('cache_creation_input_tokens') or 0)
+
+    @staticmethod
+    def _record_failure(mode: str, error: Exception, will_retry: bool):
+        """失敗した呼び出し・スロットリング・再試行を記録"""
+        metrics.incr('bedrock_requests_total', mode=mode, status='error')
+        if is_throttle(error):
+            metrics.incr('bedrock_throttles_total', mode=mode)
+        if will_retry:
+            metrics.incr('bedrock_retries_total', mode=mode)
+
+    def _build_request_body(self, prompt: Optional[str], max_tokens: int,
+                            system: Optional[Union[str, List[dict]]] = None,
+                            messages: Optional[List[dict]] = None) -> bytes:
+        """Messages API形式のリクエストボディを生成
+
+        messagesを指定しない場合は、promptを1つのuserメッセージとして送る。
+        systemには文字列か、cache_controlを付けられるテキストブロックのリストを指定する。
+        """
+        if messages is None:
+            messages = [
                 {
                     "role": "user",
                     "content": [
@@ -46,32 +241,177 @@ class BedrockClient:
                     ]
                 }
             ]
+        request_body = {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_tokens,
+            "top_k": 250,
+            "stop_sequences": [],
+            "temperature": 0.7,
+            "top_p": 0.999,
+            "messages": messages
         }
+        if system:
+            request_body["system"] = system
         
-        json_body = json.dumps(request_body).encode('utf-8')
-        retries = 0
-        
-        while retries <= self.max_retries:
+        return json.dumps(request_body).encode('utf-8')
+
+    def invoke_model(self, prompt: Optional[str] = None, max_tokens: int = 4096, cache: bool = False,
+                     system: Optional[Union[str, List[dict]]] = None,
+                     messages: Optional[List[dict]] = None,
+                     on_event: Optional[EventHandler] = None) -> Optional[str]:
+        """Claudeモデルを呼び出し、再試行できるエラーの場合は再試行する（失敗した場合はNone）
+
+        cache=Trueの場合、同じモデル・プロンプト・パラメータの出力をディスクキャッシュから返す。
+        要約など決定的に扱えるタスクでのみ指定する。
+        on_eventを指定すると、この呼び出しの再試行・失敗はクライアントのハンドラの代わりにそこへ通知する。
+        """
+        model_id = os.getenv('AWS_CLAUDE_MODEL_ID')
+        json_body = self._build_request_body(prompt, max_tokens, system, messages)
+        cache_key = get_llm_cache().make_key(model_id, json_body) if cache else None
+        if cache_key:
+            cached = get_llm_cache().get(cache_key)
+            if cached is not None:
+                return cached
+
+        attempt = 0
+        while True:
+            acquired = self.limiter.acquire()
+            outcome = 'ok'
             try:
-                self.wait_if_needed()
+                start_time = time.perf_counter()
                 response = self.client.invoke_model(
-                    modelId=os.getenv('AWS_CLAUDE_MODEL_ID'),
+                    modelId=model_id,
                     contentType="application/json",
                     accept="application/json",
                     body=json_body
                 )
-                
                 response_body = json.loads(response['body'].read())
-                return response_body['content'][0]['text']
-                
+                text = response_body['content'][0]['text']
+                self._record_usage('invoke', response_body.get('usage'), time.perf_counter() - start_time)
+                if cache_key:
+                    get_llm_cache().set(cache_key, text, response_body.get('usage'))
+                return text
+
             except Exception as e:
-                retries += 1
-                if retries <= self.max_retries:
-                    delay = self.retry_delay * (2 ** (retries - 1))  # 指数バックオフ
-                    st.warning(f"リクエストが制限されました。{delay}秒後に再試行します... ({retries}/{self.max_retries})")
-                    time.sleep(delay)
-                else:
-                    st.error(f"エラーが発生しました: {str(e)}")
+                outcome = _outcome(e)
+                attempt += 1
+                delay = self._handle_failure('invoke', e, attempt, on_event)
+                if delay is None:
                     return None
-        
-        return None
\ No newline at end of file
+            finally:
+                self.limiter.release(acquired, outcome)
+            time.sleep(delay)
+
+    async def ainvoke_model(self, prompt: Optional[str] = None, **kwargs) -> Optional[str]:
+        """invoke_modelのasyncio版（boto3の呼び出しはイベントループのスレッドプールで実行）
+
+        同時実行数は同期の呼び出しと同じリミッターで制御されるため、asyncio.gatherで多数を並べてもよい。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.invoke_model, prompt, **kwargs))
+
+    def invoke_model_stream(self, prompt: Optional[str] = None, max_tokens: int = 4096, cache: bool = False,
+                            system: Optional[Union[str, List[dict]]] = None,
+                            messages: Optional[List[dict]] = None,
+                            on_event: Optional[EventHandler] = None) -> Iterator[str]:
+        """Claudeモデルをストリーミングで呼び出し、テキストの差分を順次返す
+
+        再試行は最初のイベントを受信するまでに再試行できるエラーで失敗した場合のみ行う。
+        失敗した場合は何も返さずに終わり、受信途中で失敗した場合はそこで終わる（いずれもon_eventに通知）。
+        cache=Trueの場合はinvoke_modelと同じキャッシュを参照し、ヒット時は全文を一度に返す。
+        実行枠は応答を最後まで受信する（またはジェネレーターが閉じられる）まで保持する。
+        """
+        model_id = os.getenv('AWS_CLAUDE_MODEL_ID')
+        json_body = self._build_request_body(prompt, max_tokens, system, messages)
+        cache_key = get_llm_cache().make_key(model_id, json_body) if cache else None
+        if cache_key:
+            cached = get_llm_cache().get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+
+        attempt = 0
+        while True:
+            acquired = self.limiter.acquire()
+            try:
+                start_time = time.time()
+                response = self.client.invoke_model_with_response_stream(
+                    modelId=model_id,
+                    contentType="application/json",
+                    accept="application/json",
+                    body=json_body
+                )
+                events = iter(response['body'])
+                first_event = next(events, None)
+                break
+
+            except Exception as e:
+                self.limiter.release(acquired, _outcome(e))
+                attempt += 1
+                delay = self._handle_failure('stream', e, attempt, on_event)
+                if delay is None:
+                    return
+                time.sleep(delay)
+
+        if first_event is None:
+            self.limiter.release(acquired, 'error')
+            return
+
+        chunks = []
+        usage = {}
+        completed = False
+        try:
+            for event in self._chain_first(first_event, events):
+                payload = self._parse_stream_event(event)
+                if not payload:
+                    continue
+                if payload.get('type') == 'message_start':
+                    usage.update(payload.get('message', {}).get('usage', {}))
+                elif payload.get('type') == 'message_delta':
+                    usage.update(payload.get('usage', {}))
+                elif payload.get('type') == 'message_stop':
+                    completed = True
+
+                text = self._delta_text(payload)
+                if not text:
+                    continue
+                if not chunks:
+                    logger.info("Bedrock time to first token: %.3fs", time.time() - start_time)
+                    metrics.observe('bedrock_time_to_first_token_seconds', time.time() - start_time)
+                chunks.append(text)
+                yield text
+
+            # 途中で中断された応答はキャッシュしない
+            if completed:
+                self._record_usage('stream', usage, time.time() - start_time)
+            if cache_key and completed and chunks:
+                get_llm_cache().set(cache_key, ''.join(chunks), usage)
+        except Exception as e:
+            # 受信開始後のエラーは再送すると重複するため再試行しない
+            self._record_failure('stream', e, False)
+            (on_event or self.on_event)(BedrockEvent('error', 'stream', error_code(e), str(e), attempt + 1))
+        finally:
+            self.limiter.release(acquired, 'ok' if completed else 'error')
+            logger.info("Bedrock stream finished in %.3fs", time.time() - start_time)
+
+    @staticmethod
+    def _chain_first(first_event: dict, events: Iterator[dict]) -> Iterator[dict]:
+        yield first_event
+        yield from events
+
+    @staticmethod
+    def _parse_stream_event(event: dict) -> Optional[dict]:
+        """ストリームイベントのペイロードをデコード"""
+        chunk = event.get('chunk')
+        if not chunk:
+            return None
+        return json.loads(chunk['bytes'])
+
+    @staticmethod
+    def _delta_text(payload: dict) -> Optional[str]:
+        """ペイロードからテキスト差分を取り出す"""
+        if payload.get('type') == 'content_block_delta':
+            delta = payload.get('delta', {})
+            if delta.get('type') == 'text_delta':
+                return delta.get('text')
+        return None
@@ -0,0 +1,257 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+from .content_store import get_cache_dir
+from .number_converter import NumberConverter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    doi TEXT PRIMARY KEY,
+    version INTEGER,
+    title TEXT,
+    authors TEXT,
+    abstract TEXT,
+    category TEXT,
+    date TEXT,
+    raw TEXT
+);
+CREATE INDEX IF NOT EXISTS papers_date ON papers(date);
+CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+    title, abstract, content='papers', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract) VALUES ('delete', old.rowid, old.title, old.abstract);
+END;
+CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+    INSERT INTO papers_fts(papers_fts, rowid, title, abstract) VALUES ('delete', old.rowid, old.title, old.abstract);
+    INSERT INTO papers_fts(rowid, title, abstract) VALUES (new.rowid, new.title, new.abstract);
+END;
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# details APIから取得したページを返す関数: (開始日, 終了日, カーソル) -> レスポンスJSON
+FetchPage = Callable[[str, str, int], Optional[Dict]]
+
+
+class BiorxivIndex:
+    """bioRxivの論文メタデータを保持するSQLite FTS5インデックス"""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        if db_path is None:
+            db_path = get_cache_dir() / 'biorxiv_index.sqlite3'
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """スレッド・プロセス間で共有しないよう、操作ごとに接続を開く"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+            return row['value'] if row else None
+
+    def set_state(self, key: str, value: Optional[str]):
+        with self._connect() as conn:
+            if value is None:
+                conn.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    "INSERT INTO sync_state(key, value) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    (key, value)
+                )
+
+    def try_acquire_lease(self, owner: str, duration: float) -> bool:
+        """複数プロセスが同時に収集しないよう、期限付きのリースを取得"""
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM sync_state WHERE key = 'lease'").fetchone()
+            if row:
+                holder, expires = json.loads(row[0])
+                if holder != owner and expires > now:
+                    conn.execute("ROLLBACK")
+                    return False
+            conn.execute(
+                "INSERT INTO sync_state(key, value) VALUES ('lease', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (json.dumps([owner, now + duration]),)
+            )
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def upsert(self, papers: List[Dict]) -> int:
+        """論文を追加・更新（同じDOIは新しいバージョンのみ反映）"""
+        rows = []
+        for paper in papers:
+            doi = paper.get('doi')
+            if not doi:
+                continue
+            try:
+                version = int(paper.get('version') or 1)
+            except ValueError:
+                version = 1
+            rows.append((
+                doi, version, paper.get('title', ''), paper.get('authors', ''),
+                paper.get('abstract', ''), paper.get('category', ''),
+                paper.get('date', ''), json.dumps(paper, ensure_ascii=False)
+            ))
+
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO papers(doi, version, title, authors, abstract, category, date, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(doi) DO UPDATE SET version = excluded.version, title = excluded.title, "
+                "authors = excluded.authors, abstract = excluded.abstract, category = excluded.category, "
+                "date = excluded.date, raw = excluded.raw "
+                "WHERE excluded.version >= papers.version",
+                rows
+            )
+        return len(rows)
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    @staticmethod
+    def build_match_query(query: str) -> str:
+        """検索語をFTS5のMATCH式に変換（各語はAND、数字はアラビア/ローマ数字をOR）
+
+        単語は前方一致、数字は完全一致にする（「2」が「2024」や「22」に一致しないよう、QueryMatcherと同じ扱い）。
+        """
+        terms = []
+        for word in query.lower().split():
+            variants = NumberConverter.get_all_number_variants(word)
+            quoted = ['"{}"{}'.format(v.replace('"', '""'), '' if NumberConverter.is_number(v) else '*')
+                      for v in sorted(variants) if v.strip('"')]
+            if quoted:
+                terms.append(f"({' OR '.join(quoted)})" if len(quoted) > 1 else quoted[0])
+        return ' AND '.join(terms)
+
+    def search(self, query: str, limit: int = 5, date_from: Optional[str] = None,
+               date_to: Optional[str] = None, offset: int = 0, newest_first: bool = False) -> List[Dict]:
+        """BM25でランク付けした検索結果（タイトルを重視、newest_firstなら投稿日の新しい順）のうち、offset件目からlimit件を返す"""
+        match = self.build_match_query(query)
+        if not match:
+            return []
+
+        sql = ("SELECT p.raw FROM papers_fts JOIN papers p ON p.rowid = papers_fts.rowid "
+               "WHERE papers_fts MATCH ?")
+        params: List = [match]
+        if date_from:
+            sql += " AND p.date >= ?"
+            params.append(date_from)
+        if date_to:
+            sql += " AND p.date <= ?"
+            params.append(date_to)
+        sql += " ORDER BY " + ("p.date DESC, " if newest_first else "") + "bm25(papers_fts, 10.0, 1.0) LIMIT ? OFFSET ?"
+        params.extend([limit, offset])
+
+        with self._connect() as conn:
+            return [json.loads(row['raw']) for row in conn.execute(sql, params)]
+
+
+class BiorxivHarvester:
+    """details APIをカーソルでページングし、インデックスを差分同期するバックグラウンド処理"""
+
+    def __init__(self, index: BiorxivIndex, fetch_page: FetchPage,
+                 initial_days: int = 365, interval: float = 6 * 3600):
+        self.index = index
+        self.fetch_page = fetch_page
+        self.initial_days = int(os.getenv('BIORXIV_INDEX_DAYS', initial_days))
+        self.interval = interval
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """収集スレッドを開始（既に動作中なら何もしない）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='biorxiv-harvester', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"bioRxiv harvest error: {e}")
+            self._stop.wait(self.interval)
+
+    def sync(self) -> int:
+        """前回の同期以降の期間のみを取得し、取得件数を返す"""
+        if not self.index.try_acquire_lease(self.owner, duration=600):
+            return 0
+
+        # 途中で中断した同期があれば、その期間とカーソルから再開する
+        start = self.index.get_state('pending_start')
+        end = self.index.get_state('pending_end')
+        cursor = int(self.index.get_state('pending_cursor') or 0)
+        if not start or not end:
+            # 最終同期日は投稿が途中までしか反映されていない可能性があるため含めて再取得
+            start = self.index.get_state('harvested_until') or \
+                (date.today() - timedelta(days=self.initial_days)).isoformat()
+            end = date.today().isoformat()
+            cursor = 0
+            self.index.set_state('pending_start', start)
+            self.index.set_state('pending_end', end)
+
+        harvested = 0
+        while not self._stop.is_set():
+            if not self.index.try_acquire_lease(self.owner, duration=600):
+                # リースが切れて他のプロセスに移った。途中の状態はそちらが引き継ぐ
+                return harvested
+            data = self.fetch_page(start, end, cursor)
+            if not data:
+                return harvested
+
+            papers = data.get('collection', [])
+            harvested += self.index.upsert(papers)
+
+            messages = data.get('messages') or [{}]
+            total = int(messages[0].get('total', 0) or 0)
+            cursor += len(papers)
+            self.index.set_state('pending_cursor', str(cursor))
+            if not papers or cursor >= total:
+                break
+        else:
+            return harvested
+
+        self.index.set_state('harvested_until', end)
+        self.index.set_state('pending_start', None)
+        self.index.set_state('pending_end', None)
+        self.index.set_state('pending_cursor', None)
+        return harvested
@@ -1,34 +1,213 @@
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Optional, Tuple
+
+from .token_budget import estimate_tokens, truncate_to_tokens
+
+# 質問ごとに新たに送る部分（会話履歴・本文の抜粋・質問）のトークン予算
+# （プロンプトキャッシュに載せる論文情報と本文は PAPER_CONTEXT_TOKEN_BUDGET で別に制限）
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_BUDGET', 8000))
+# そのうち会話履歴（要約＋直近の会話）に使う上限
+HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_BUDGET', 2000))
+# 古い会話の要約の上限
+SUMMARY_TOKEN_BUDGET = int(os.getenv('CHAT_SUMMARY_BUDGET', 400))
+# 要約せずに必ずそのまま残す直近のメッセージ数
+RECENT_MESSAGES = int(os.getenv('CHAT_RECENT_MESSAGES', 4))
+# 論文情報（タイトル・著者・アブストラクト）の上限
+METADATA_TOKEN_BUDGET = 1000
+# プロンプトキャッシュの対象にする論文本文の先頭部分の上限。論文情報と合わせてキャッシュの最小トークン数を
+# 超える程度に小さく保ち、残りの本文は質問ごとにBM25で選んだパッセージとして送る（毎回本文全体を送らない）
+PAPER_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_PAPER_CONTEXT_BUDGET', 1500))
+# Bedrockのプロンプトキャッシュが有効になる最小トークン数
+CACHE_MIN_TOKENS = 1024
+# 既定の要約で1メッセージから残す量
+EXCERPT_TOKENS = 60
+
+# 要約関数: (これまでの要約, 新たに要約に移すメッセージ) -> 新しい要約
+Summarizer = Callable[[str, List['Message']], Optional[str]]
+
 
 @dataclass
 class Message:
     role: str  # 'user' または 'assistant'
     content: str
+    tokens: int = field(default=0, compare=False)  # 概算トークン数（追加時に一度だけ計算）
+
+    def __post_init__(self):
+        if not self.tokens:
+            self.tokens = estimate_tokens(self.content) + 2  # 'role: ' の分
+
+
+def summarize_extractive(summary: str, messages: List[Message]) -> str:
+    """LLMを使わない既定の要約（各メッセージの冒頭を追記し、上限を超えたら古い行から削る）"""
+    lines = [line for line in summary.split('\n') if line]
+    for msg in messages:
+        first_sentence = re.split(r'(?<=[。．.!?！？])\s*', msg.content.strip(), maxsplit=1)[0]
+        lines.append(f"{msg.role}: {truncate_to_tokens(first_sentence, EXCERPT_TOKENS)}")
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return truncate_to_tokens('\n'.join(lines), SUMMARY_TOKEN_BUDGET)
+
 
 class ChatSession:
-    def __init__(self, paper: Dict):
+    def __init__(self, paper: Dict, summarizer: Optional[Summarizer] = None,
+                 context_budget: int = CONTEXT_TOKEN_BUDGET, history_budget: int = HISTORY_TOKEN_BUDGET):
         self.paper = paper
         self.messages: List[Message] = []
+        self.summarizer = summarizer
+        self.context_budget = context_budget
+        self.history_budget = history_budget
+        # messages[:summarized_count] は summary に畳み込み済み
+        self.summary = ''
+        self.summarized_count = 0
+        self._metadata: Optional[str] = None
+        self._paper_context: Optional[Tuple[Optional[str], str, bool]] = None
+        # 表示用に連結した古いメッセージのMarkdownと、その件数
+        self._history_markdown = ''
+        self._history_markdown_count = 0
 
     def add_message(self, role: str, content: str):
         """新しいメッセージを会話に追加"""
         self.messages.append(Message(role=role, content=content))
 
-    def get_context_for_prompt(self) -> str:
-        """プロンプト用のコンテキストを生成"""
-        context = f"""論文情報：
-タイトル: {self.paper['title']}
-著者: {self.paper['authors']}
-要約: {self.paper['summary']}
+    def _paper_metadata(self) -> str:
+        """論文情報（アブストラクトは上限に収まるよう切り詰め、一度だけ生成）"""
+        if self._metadata is None:
+            header = f"論文情報：\nタイトル: {self.paper['title']}\n著者: {self.paper['authors']}\n要約: "
+            remaining = METADATA_TOKEN_BUDGET - estimate_tokens(header)
+            self._metadata = header + truncate_to_tokens(self.paper['summary'] or '', max(0, remaining))
+        return self._metadata
+
+    def _fold_into_summary(self, end: int):
+        """messages[summarized_count:end] を要約に追加（要約済みの部分は再処理しない）"""
+        if end <= self.summarized_count:
+            return
+        new_messages = self.messages[self.summarized_count:end]
+        summary = None
+        if self.summarizer:
+            try:
+                summary = self.summarizer(self.summary, new_messages)
+            except Exception as e:
+                print(f"Chat summary error: {e}")
+        if not summary:
+            summary = summarize_extractive(self.summary, new_messages)
+        self.summary = truncate_to_tokens(summary, SUMMARY_TOKEN_BUDGET)
+        self.summarized_count = end
 
-これまでの会話:"""
+    def _recent_budget(self) -> int:
+        """履歴の予算のうち、要約を除いて直近の会話に使える分"""
+        return self.history_budget - (estimate_tokens(self.summary) if self.summary else 0)
 
-        for msg in self.messages:
-            context += f"\n{msg.role}: {msg.content}"
+    def _recent_window(self, budget: int) -> int:
+        """予算に収まる、そのまま残す直近メッセージの開始位置"""
+        start = len(self.messages)
+        used = 0
+        while start > self.summarized_count:
+            tokens = self.messages[start - 1].tokens
+            if used + tokens > budget and len(self.messages) - start >= RECENT_MESSAGES:
+                break
+            used += tokens
+            start -= 1
+        return start
 
+    def recent_turns(self) -> List[Tuple[str, str]]:
+        """そのまま残す直近の会話を (role, 内容) で返す
+
+        履歴の予算からあふれた古い会話は要約に畳み込む。毎ターン要約し直さないよう、
+        あふれた時点で直近の会話が予算の半分に収まるまでまとめて畳み込む。
+        """
+        start = self._recent_window(self._recent_budget())
+        if start > self.summarized_count:
+            self._fold_into_summary(self._recent_window(self._recent_budget() // 2))
+            start = self._recent_window(self._recent_budget())
+        while start > self.summarized_count:
+            # 要約が伸びて直近の枠が縮んだ場合
+            self._fold_into_summary(start)
+            start = self._recent_window(self._recent_budget())
+
+        recent = self.messages[start:]
+        # 直近のメッセージ自体が予算を超える場合は、古い方から切り詰める
+        overflow = sum(msg.tokens for msg in recent) - self._recent_budget()
+        turns = []
+        for msg in recent:
+            content = msg.content
+            if overflow > 0:
+                kept = truncate_to_tokens(content, max(EXCERPT_TOKENS, msg.tokens - overflow))
+                if kept != content:
+                    overflow -= msg.tokens - estimate_tokens(kept)
+                    content = kept + ' …'
+            turns.append((msg.role, content))
+        return turns
+
+    def get_context_for_prompt(self) -> str:
+        """プロンプト用のコンテキストを1つの文字列として生成"""
+        turns = self.recent_turns()
+        context = self._paper_metadata()
+        if self.summary:
+            context += f"\n\nこれまでの会話の要約:\n{self.summary}"
+        context += "\n\nこれまでの会話:"
+        for role, content in turns:
+            context += f"\n{role}: {content}"
         return context
 
+    def paper_context(self, paper_content: Optional[str] = None) -> Tuple[str, bool]:
+        """会話中に変わらない論文情報と本文（プロンプトキャッシュの対象）と、本文を切り詰めたかどうか"""
+        if self._paper_context is None or self._paper_context[0] is not paper_content:
+            text = self._paper_metadata()
+            truncated = False
+            if paper_content:
+                body = truncate_to_tokens(paper_content, PAPER_CONTEXT_TOKEN_BUDGET)
+                truncated = len(body) < len(paper_content)
+                text += f"\n\n論文本文:\n{body}"
+            self._paper_context = (paper_content, text, truncated)
+        return self._paper_context[1], self._paper_context[2]
+
+    def build_request(self, turns: List[Tuple[str, str]], question: str, instruction: str,
+                      paper_content: Optional[str] = None) -> Tuple[List[Dict], List[Dict]]:
+        """Messages API用の (system, messages) を生成
+
+        論文情報と本文はcache_controlを付けたsystemブロックに置き、同じ論文への以降の質問で再利用させる。
+        会話の要約は毎回変わりうるため、キャッシュの区切りより後に置く。
+        """
+        context, _ = self.paper_context(paper_content)
+        paper_block = {'type': 'text', 'text': context}
+        if estimate_tokens(context) >= CACHE_MIN_TOKENS:
+            paper_block['cache_control'] = {'type': 'ephemeral'}
+        system = [{'type': 'text', 'text': instruction}, paper_block]
+        if self.summary:
+            system.append({'type': 'text', 'text': f"これまでの会話の要約:\n{self.summary}"})
+
+        messages: List[Dict] = []
+        for role, content in turns + [('user', question)]:
+            if messages and messages[-1]['role'] == role:
+                # 応答に失敗したターンなどで同じroleが続く場合は1つにまとめる
+                messages[-1]['content'][0]['text'] += f"\n\n{content}"
+                continue
+            if not messages and role != 'user':
+                # messagesはuserから始める必要がある
+                messages.append({'role': 'user', 'content': [{'type': 'text', 'text': '（これまでの会話の続き）'}]})
+            messages.append({'role': role, 'content': [{'type': 'text', 'text': content}]})
+        return system, messages
+
+    def available_tokens(self, *parts: str) -> int:
+        """総予算から、プロンプトに含める各テキストの分を除いた残りトークン数（本文の抜粋用）"""
+        return max(0, self.context_budget - sum(estimate_tokens(part) for part in parts))
+
     def format_message_for_display(self, message: Message) -> str:
         """メッセージを表示用にフォーマット"""
-        return message.content
\ No newline at end of file
+        return message.content
+
+    def history_markdown(self, count: int) -> str:
+        """先頭からcount件のメッセージを1つのMarkdownにまとめる（追加分だけ連結し、結果を保持）"""
+        if count < self._history_markdown_count:
+            self._history_markdown = ''
+            self._history_markdown_count = 0
+        labels = {'user': 'あなた', 'assistant': 'アシスタント'}
+        parts = [self._history_markdown] if self._history_markdown else []
+        for message in self.messages[self._history_markdown_count:count]:
+            label = labels.get(message.role, message.role)
+            parts.append(f"**{label}:**\n\n{self.format_message_for_display(message)}")
+        self._history_markdown = '\n\n---\n\n'.join(parts)
+        self._history_markdown_count = count
+        return self._history_markdown
@@ -0,0 +1,271 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from . import metrics
+
+DEFAULT_TTL = 86400  # 24時間
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# 最終アクセス時刻をこの秒数より細かくは更新しない（LRUの順序にはこの程度の粗さで十分）
+ACCESS_RESOLUTION = 60.0
+# 読み込み時の統計・最終アクセス時刻の更新は、件数か経過時間がこれを超えたらまとめて書き込む
+FLUSH_PENDING = 100
+FLUSH_INTERVAL = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+-- 保存バイト数の合計（書き込みのたびに全件を集計しないよう、トリガーで差分を反映する）
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE meta SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries BEGIN
+    UPDATE meta SET value = value - OLD.size WHERE name = 'bytes';
+END;
+INSERT OR IGNORE INTO meta(name, value) SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries;
+"""
+
+
+def get_cache_dir() -> Path:
+    """キャッシュディレクトリを取得（なければ作成、PAPER_ASSISTANT_CACHE_DIRで変更可能）"""
+    cache_dir = Path(os.getenv('PAPER_ASSISTANT_CACHE_DIR') or Path.home() / '.paper_assistant_cache')
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    return cache_dir
+
+
+class ContentStore:
+    """zlib圧縮・容量上限付きLRU・名前空間別TTLを持つSQLiteベースのキャッシュ"""
+
+    def __init__(self, db_path: Optional[Path] = None, max_bytes: Optional[int] = None,
+                 ttls: Optional[Dict[str, float]] = None, default_ttl: float = DEFAULT_TTL):
+        self.db_path = Path(db_path) if db_path else get_cache_dir() / 'content.sqlite3'
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        if max_bytes is None:
+            max_bytes = int(os.getenv('CONTENT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        # まだ書き込んでいない統計の加算と最終アクセス時刻
+        self._pending_stats: Dict[str, int] = {}
+        self._pending_access: Dict[Tuple[str, str], float] = {}
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._pending_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+        atexit.register(self.flush)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """操作ごとに接続を開き、1トランザクションとしてコミット"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def _incr(self, conn: sqlite3.Connection, name: str, amount: int = 1):
+        conn.execute(
+            "INSERT INTO stats(name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount)
+        )
+
+    def incr_stat(self, name: str, amount: int = 1):
+        """任意の統計カウンタを加算"""
+        with self._connect() as conn:
+            self._incr(conn, name, amount)
+
+    def _write_pending(self, conn: sqlite3.Connection):
+        """溜めている統計・最終アクセス時刻を、呼び出し側のトランザクションで書き込む"""
+        with self._pending_lock:
+            stats, self._pending_stats = self._pending_stats, {}
+            access, self._pending_access = self._pending_access, {}
+            self._pending_count = 0
+            self._last_flush = time.monotonic()
+        for name, amount in stats.items():
+            self._incr(conn, name, amount)
+        conn.executemany(
+            "UPDATE entries SET accessed = MAX(accessed, ?) WHERE namespace = ? AND key = ?",
+            [(accessed, namespace, key) for (namespace, key), accessed in access.items()]
+        )
+
+    def flush(self):
+        """溜めている統計・最終アクセス時刻を書き込む"""
+        if not self._pending_stats and not self._pending_access:
+            return
+        try:
+            with self._connect() as conn:
+                self._write_pending(conn)
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def incr_stats(self, amounts: Dict[str, int]):
+        """統計カウンタをまとめて加算（読み込みの統計・最終アクセス時刻と同じトランザクションで後から書き込む）"""
+        self._add_pending(amounts)
+
+    def _add_pending(self, stats: Dict[str, int], entry: Optional[Tuple[str, str]] = None, accessed: float = 0.0):
+        """統計と最終アクセス時刻を溜め、一定量・一定時間ごとにまとめて書き込む"""
+        with self._pending_lock:
+            for name, amount in stats.items():
+                self._pending_stats[name] = self._pending_stats.get(name, 0) + amount
+            if entry is not None:
+                self._pending_access[entry] = accessed
+            self._pending_count += 1
+            due = (self._pending_count >= FLUSH_PENDING
+                   or time.monotonic() - self._last_flush >= FLUSH_INTERVAL)
+        if due:
+            self.flush()
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        """TTL内のキャッシュを取得（最終アクセス時刻・統計の更新は溜めてまとめて書き込む）"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data, created, accessed FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            expired = row is not None and now - row[1] >= self.ttl_for(namespace)
+            if expired:
+                # 期限切れのエントリは削除
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+        if row and not expired:
+            # 直近に更新済みなら最終アクセス時刻は書き込まない
+            self._add_pending({'hits': 1}, (namespace, key) if now - row[2] >= ACCESS_RESOLUTION else None, now)
+            metrics.incr('cache_requests_total', namespace=namespace, result='hit')
+            return zlib.decompress(row[0]).decode('utf-8')
+
+        self._add_pending({'misses': 1})
+        metrics.incr('cache_requests_total', namespace=namespace, result='miss')
+        return None
+
+    def set(self, namespace: str, key: str, value: str):
+        """圧縮して保存し、容量上限を超えた分を古いアクセス順に削除"""
+        data = zlib.compress(value.encode('utf-8'))
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT INTO entries(namespace, key, data, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(namespace, key) DO UPDATE SET data = excluded.data, "
+                    "size = excluded.size, created = excluded.created, accessed = excluded.accessed",
+                    (namespace, key, data, len(data), now, now)
+                )
+                self._write_pending(conn)
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        rows = conn.execute("SELECT namespace, key, size FROM entries ORDER BY accessed").fetchall()
+        for namespace, key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            total -= size
+            evicted += 1
+        self._incr(conn, 'evictions', evicted)
+        metrics.incr('cache_evictions_total', evicted)
+
+    def try_acquire_lease(self, name: str, owner: str, duration: float) -> bool:
+        """同じ値を複数プロセスが同時に生成しないよう、名前ごとに期限付きのリースを取得"""
+        now = time.time()
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT owner, expires FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute(
+                "INSERT INTO leases(name, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires",
+                (name, owner, now + duration)
+            )
+            conn.execute("COMMIT")
+            return True
+        finally:
+            conn.close()
+
+    def release_lease(self, name: str, owner: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def lease_held(self, name: str) -> bool:
+        """他の誰かが期限内のリースを持っているか"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT expires FROM leases WHERE name = ?", (name,)).fetchone()
+            return bool(row and row[0] > time.time())
+
+    def delete(self, namespace: str, key: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数・削除数・保存バイト数・エントリ数を取得"""
+        self.flush()
+        with self._connect() as conn:
+            result = {'hits': 0, 'misses': 0, 'evictions': 0}
+            result.update(dict(conn.execute("SELECT name, value FROM stats").fetchall()))
+            result['entries'] = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            result['bytes'] = conn.execute("SELECT value FROM meta WHERE name = 'bytes'").fetchone()[0]
+            return result
+
+
+_store: Optional[ContentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_content_store() -> ContentStore:
+    """プロセス全体で共有される論文本文キャッシュを取得"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ContentStore(ttls={
+                'arxiv': 30 * 86400,  # 版ごとのIDで取得するため内容は変わらない
+                'biorxiv': 7 * 86400,  # プレプリント本文は改訂されうるため1週間
+                'pubmed': 30 * 86400,  # PMCの本文はほぼ更新されない
+            })
+        return _store
@@ -0,0 +1,128 @@
+import re
+import time
+from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dateutil import parser as date_parser
+
+from . import metrics
+from .paper_sources import SORT_NEWEST, SOURCE_CLASSES, SearchPage
+from .search_cache import cached_search_page
+
+# ソースごとの検索の締め切り（秒）。超えた場合はそのソースの結果を待たない
+SOURCE_DEADLINES = {
+    'arXiv': 15.0,
+    'bioRxiv': 10.0,
+    'PubMed': 10.0
+}
+DEFAULT_DEADLINE = 10.0
+RRF_K = 60  # Reciprocal Rank Fusionの定数
+
+
+def _search_source(source_name: str, query: str, max_results: int, cursor: Optional[str] = None,
+                   sort_order: Optional[str] = None) -> SearchPage:
+    with metrics.timer('stage_seconds', stage='search', source=source_name):
+        return cached_search_page(source_name, query, max_results, cursor, sort_order)
+
+
+def federated_search(query: str, max_results: int = 5,
+                     source_names: Optional[Iterable[str]] = None,
+                     deadlines: Optional[Dict[str, float]] = None,
+                     cursors: Optional[Dict[str, Optional[str]]] = None,
+                     sort_order: Optional[str] = None) -> Iterator[Tuple[str, List[Dict], Optional[str]]]:
+    """全ソースへ並行して検索し、完了したソースから順に (ソース名, 結果, 次のページのカーソル) を返す
+
+    cursorsを渡すと各ソースのその位置から次のページを検索する（source_names省略時はカーソルのあるソースのみ）。
+    結果は共有の検索結果キャッシュを通して取得する。
+    締め切りを過ぎたソースは結果を待たずに打ち切り、カーソルはNoneを返す。
+    """
+    if source_names is not None:
+        source_names = list(source_names)
+    elif cursors is not None:
+        source_names = [name for name, cursor in cursors.items() if cursor]
+    else:
+        source_names = list(SOURCE_CLASSES)
+    cursors = cursors or {}
+    if not source_names:
+        return
+    deadlines = {**SOURCE_DEADLINES, **(deadlines or {})}
+    start = time.monotonic()
+
+    executor = ThreadPoolExecutor(max_workers=len(source_names), thread_name_prefix='federated-search')
+    pending: Dict[Future, str] = {}
+    try:
+        pending = {
+            executor.submit(_search_source, name, query, max_results, cursors.get(name), sort_order): name
+            for name in source_names
+        }
+        expires = {
+            future: start + deadlines.get(name, DEFAULT_DEADLINE)
+            for future, name in pending.items()
+        }
+
+        while pending:
+            timeout = max(0.0, min(expires[f] for f in pending) - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    results, next_cursor = future.result()
+                except Exception as e:
+                    print(f"{name} search error: {e}")
+                    results, next_cursor = [], None
+                yield name, results, next_cursor
+
+            now = time.monotonic()
+            for future in [f for f in pending if expires[f] <= now]:
+                name = pending.pop(future)
+                print(f"{name} search timed out")
+                yield name, [], None
+    finally:
+        # 締め切りを過ぎたソースの完了は待たない（cancel_futuresはPython 3.9以降のため、個別にキャンセル）
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _normalize_title(title: str) -> str:
+    return re.sub(r'[^0-9a-z]+', ' ', (title or '').lower()).strip()
+
+
+def _dedup_key(paper: Dict) -> str:
+    """DOIがあればDOI、なければ正規化したタイトルで重複判定"""
+    doi = paper.get('doi')
+    if doi:
+        return 'doi:' + doi.lower().strip()
+    return 'title:' + _normalize_title(paper.get('title', ''))
+
+
+def _published_key(paper: Dict) -> datetime:
+    """公開日の並べ替え用のキー（PubMedの「2024 Jan 15」なども解釈し、解釈できなければ最も古い扱い）"""
+    try:
+        return date_parser.parse(paper.get('published') or '', default=datetime(1, 1, 1))
+    except (ValueError, OverflowError):
+        return datetime.min
+
+
+def merge_results(results_by_source: Dict[str, List[Dict]], sort_order: Optional[str] = None) -> List[Dict]:
+    """ソース別の結果を重複排除し、Reciprocal Rank Fusionで1つのランキングに統合（SORT_NEWESTなら公開日の新しい順）"""
+    scores: Dict[str, float] = {}
+    papers: Dict[str, Dict] = {}
+    title_keys: Dict[str, str] = {}
+
+    for results in results_by_source.values():
+        for rank, paper in enumerate(results):
+            key = _dedup_key(paper)
+            # DOIの有無がソースで異なる場合もタイトルで同一論文とみなす
+            title_key = _normalize_title(paper.get('title', ''))
+            key = title_keys.setdefault(title_key, key) if title_key else key
+
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+            papers.setdefault(key, paper)
+
+    ranked = sorted(scores, key=lambda k: scores[k], reverse=True)
+    if sort_order == SORT_NEWEST:
+        ranked.sort(key=lambda k: _published_key(papers[k]), reverse=True)
+    return [papers[key] for key in ranked]
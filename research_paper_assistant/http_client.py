@@ -0,0 +1,116 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+# API別のデフォルトレート（リクエスト/秒）
+DEFAULT_RATES = {
+    'arxiv': 1 / 3,   # arXiv API利用規約: 3秒に1リクエスト
+    'biorxiv': 1.0,
+    'ncbi': 3.0,      # NCBI E-utilities: APIキーなしで3リクエスト/秒
+}
+NCBI_RATE_WITH_API_KEY = 10.0  # APIキーありで10リクエスト/秒
+
+
+class TokenBucket:
+    """スレッドセーフなトークンバケット方式のレート制限"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """トークンを取得できるまで待機し、待機した秒数を返す"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def get_ncbi_api_key() -> Optional[str]:
+    """NCBI APIキーを取得（未設定ならNone）"""
+    return os.getenv('NCBI_API_KEY') or None
+
+
+def _configured_rate(api: str) -> float:
+    """環境変数 <API>_RATE_LIMIT で上書き可能なレートを取得"""
+    override = os.getenv(f"{api.upper()}_RATE_LIMIT")
+    if override:
+        return float(override)
+    if api == 'ncbi' and get_ncbi_api_key():
+        return NCBI_RATE_WITH_API_KEY
+    return DEFAULT_RATES.get(api, 1.0)
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def get_rate_limiter(api: str) -> TokenBucket:
+    """プロセス全体で共有されるAPI別のレートリミッターを取得"""
+    with _lock:
+        if api not in _limiters:
+            _limiters[api] = TokenBucket(_configured_rate(api))
+        return _limiters[api]
+
+
+def get_session(url: str) -> requests.Session:
+    """ホスト単位で共有されるkeep-aliveセッションを取得"""
+    host = urlparse(url).netloc
+    with _lock:
+        if host not in _sessions:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _sessions[host] = session
+        return _sessions[host]
+
+
+def wait_for_rate_limit(api: str) -> float:
+    """API別のレート制限のための待機（待機時間は計測値として記録）"""
+    waited = get_rate_limiter(api).acquire()
+    metrics.observe('rate_limit_wait_seconds', waited, api=api)
+    return waited
+
+
+def request(method: str, url: str, api: Optional[str] = None, **kwargs) -> requests.Response:
+    """レート制限を適用して共有セッションからリクエストを送信"""
+    if api:
+        wait_for_rate_limit(api)
+    kwargs.setdefault('timeout', 30)
+    if not metrics.is_enabled():
+        return get_session(url).request(method, url, **kwargs)
+
+    host = urlparse(url).netloc
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        response = get_session(url).request(method, url, **kwargs)
+        status = str(response.status_code)
+        return response
+    finally:
+        # stream=Trueの場合は応答ヘッダー受信までの時間
+        metrics.observe('http_request_seconds', time.perf_counter() - start, host=host)
+        metrics.incr('http_requests_total', host=host, status=status)
@@ -0,0 +1,120 @@
+from io import BytesIO
+from typing import IO, List, Optional, Union
+
+from lxml import etree
+
+# 本文の構造を保持する要素（body直下とその入れ子のsec）
+FRAME_TAGS = ('body', 'sec')
+
+
+def _local_name(element) -> str:
+    """名前空間接頭辞なしの要素は局所名、接頭辞付きは 'prefix:name'（BeautifulSoupのxmlモードと同じ）"""
+    if not isinstance(element.tag, str):
+        return ''
+    name = etree.QName(element).localname
+    return f"{element.prefix}:{name}" if element.prefix else name
+
+
+class _Frame:
+    """処理中のbody/secの、直下のタイトル・段落・サブセクション"""
+
+    __slots__ = ('element', 'title', 'paragraphs', 'subsections')
+
+    def __init__(self, element):
+        self.element = element
+        self.title: Optional[str] = None
+        self.paragraphs: List[str] = []
+        self.subsections: List[str] = []
+
+    def lines(self) -> List[str]:
+        lines = []
+        if self.title is not None:
+            lines.append(f"\nSection: {self.title.strip()}")
+        lines.extend(self.paragraphs)
+        lines.extend(self.subsections)
+        return lines
+
+
+def extract_text(source: Union[bytes, IO[bytes]]) -> str:
+    """JATS XML（PMC・bioRxiv）から本文を1パスで抽出
+
+    iterparseで要素を順に処理し、不要になった要素はその場で解放する。
+    出力はタイトル・アブストラクト・本文セクションの順で、
+    BeautifulSoupで木全体を走査していた従来の実装と同じテキストになる。
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+
+    article_title: Optional[str] = None
+    abstract: Optional[str] = None
+    body_lines: Optional[List[str]] = None
+
+    frames: List[_Frame] = []
+    # テキストを取り出す必要がある要素（開始時に判定）とその種類
+    captures = {}
+    capture_depth = 0
+
+    for event, element in etree.iterparse(source, events=('start', 'end'), recover=True,
+                                          huge_tree=True, remove_comments=True, remove_pis=True):
+        name = _local_name(element)
+        parent = element.getparent()
+        parent_frame = frames[-1] if frames and parent is frames[-1].element else None
+
+        if event == 'start':
+            kind = None
+            if name == 'article-title' and article_title is None and 'article-title' not in captures.values():
+                kind = 'article-title'
+            elif name == 'abstract' and abstract is None and 'abstract' not in captures.values():
+                kind = 'abstract'
+            elif parent_frame and capture_depth == 0:
+                if name == 'p':
+                    kind = 'p'
+                elif name == 'title' and parent_frame.title is None:
+                    kind = 'title'
+
+            if kind:
+                captures[element] = kind
+                capture_depth += 1
+
+            if body_lines is None and capture_depth == 0 and (
+                    (name == 'body' and not frames) or (name == 'sec' and parent_frame)):
+                frames.append(_Frame(element))
+            continue
+
+        kind = captures.pop(element, None)
+        if kind:
+            capture_depth -= 1
+            if kind == 'article-title':
+                article_title = ''.join(element.itertext())
+            elif kind == 'abstract':
+                abstract = ''.join(text.strip() for text in element.itertext())
+            elif kind == 'p':
+                text = ' '.join(filter(None, (text.strip() for text in element.itertext())))
+                if text:
+                    parent_frame.paragraphs.append(text)
+            elif kind == 'title' and parent_frame.title is None:
+                parent_frame.title = ''.join(element.itertext())
+
+        if frames and element is frames[-1].element:
+            frame = frames.pop()
+            if frames:
+                frames[-1].subsections.extend(frame.lines())
+            else:
+                body_lines = frame.lines()
+
+        # 祖先がテキストを必要としていなければ、処理済みの要素を解放する
+        if capture_depth == 0:
+            element.clear(keep_tail=True)
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    sections = []
+    if article_title is not None:
+        sections.append(f"Title: {article_title}")
+    if abstract is not None:
+        sections.append("\nAbstract:")
+        sections.append(abstract)
+    if body_lines:
+        sections.extend(body_lines)
+    return '\n\n'.join(filter(None, sections))
@@ -0,0 +1,176 @@
+import gzip
+import io
+import re
+import tarfile
+from typing import Dict, List, Optional, Tuple
+
+# 展開後のソースの上限（tar爆弾対策）
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+MAX_INPUT_DEPTH = 10
+
+SECTION_RE = re.compile(r'\\(section|subsection|subsubsection)\*?\s*(?:\[[^\]]*\])?\s*\{')
+INPUT_RE = re.compile(r'\\(?:input|include)\s*\{([^}]+)\}')
+COMMENT_RE = re.compile(r'(?<!\\)%.*')
+# 本文から取り除く環境（図表・数式・参考文献など）
+DROP_ENVIRONMENTS = ('figure', 'figure*', 'table', 'table*', 'equation', 'equation*', 'align', 'align*',
+                     'eqnarray', 'eqnarray*', 'thebibliography', 'tikzpicture', 'algorithm', 'algorithmic')
+# 引数ごと取り除くコマンド
+DROP_COMMANDS = ('cite', 'citep', 'citet', 'ref', 'eqref', 'autoref', 'cref', 'Cref', 'label', 'footnote',
+                 'bibliography', 'bibliographystyle', 'includegraphics', 'vspace', 'hspace', 'url')
+TEXT_COMMAND_RE = re.compile(r'\\[a-zA-Z]+\*?(?:\[[^\]]*\])?\{([^{}]*)\}')
+BARE_COMMAND_RE = re.compile(r'\\[a-zA-Z]+\*?')
+INLINE_MATH_RE = re.compile(r'(?<!\\)(\$[^$]+\$)')
+
+
+def unpack_source(data: bytes) -> Dict[str, str]:
+    """arXivのe-print（gzip圧縮のtar、または単一のgzip圧縮TeX）から.texファイルを取り出す"""
+    files: Dict[str, str] = {}
+    try:
+        archive = tarfile.open(fileobj=io.BytesIO(data), mode='r:*')
+    except tarfile.TarError:
+        archive = None
+
+    if archive is None:
+        if data[:2] == b'\x1f\x8b':
+            with gzip.GzipFile(fileobj=io.BytesIO(data)) as f:
+                data = f.read(MAX_SOURCE_BYTES + 1)[:MAX_SOURCE_BYTES]
+        files['main.tex'] = data.decode('utf-8', errors='replace')
+        return files
+
+    total = 0
+    with archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith('.tex'):
+                continue
+            total += member.size
+            if total > MAX_SOURCE_BYTES:
+                break
+            f = archive.extractfile(member)
+            if f:
+                files[member.name.lstrip('./')] = f.read().decode('utf-8', errors='replace')
+    return files
+
+
+def _braced(text: str, start: int) -> Tuple[str, int]:
+    """text[start] の '{' に対応する '}' までの中身と、その次の位置"""
+    depth = 0
+    for i in range(start, len(text)):
+        c = text[i]
+        if c == '{' and (i == 0 or text[i - 1] != '\\'):
+            depth += 1
+        elif c == '}' and text[i - 1] != '\\':
+            depth -= 1
+            if depth == 0:
+                return text[start + 1:i], i + 1
+    return text[start + 1:], len(text)
+
+
+def _find_main(files: Dict[str, str]) -> Optional[str]:
+    candidates = [name for name, text in files.items() if '\\begin{document}' in text]
+    if not candidates:
+        return None
+    for preferred in ('main.tex', 'ms.tex', 'paper.tex'):
+        if preferred in candidates:
+            return preferred
+    return max(candidates, key=lambda name: len(files[name]))
+
+
+def _resolve_inputs(text: str, files: Dict[str, str], depth: int = 0) -> str:
+    """\\input・\\include を展開（存在しないファイルは無視）"""
+    if depth >= MAX_INPUT_DEPTH:
+        return text
+
+    def replace(match):
+        name = match.group(1).strip()
+        for candidate in (name, f"{name}.tex"):
+            if candidate in files:
+                return _resolve_inputs(COMMENT_RE.sub('', files[candidate]), files, depth + 1)
+        return ''
+    return INPUT_RE.sub(replace, text)
+
+
+def _command_argument(text: str, command: str) -> Optional[str]:
+    match = re.search(r'\\' + command + r'\s*(?:\[[^\]]*\])?\s*\{', text)
+    if not match:
+        return None
+    value, _ = _braced(text, match.end() - 1)
+    return value
+
+
+def _environment(text: str, name: str) -> Optional[str]:
+    match = re.search(r'\\begin\{' + re.escape(name) + r'\}(.*?)\\end\{' + re.escape(name) + r'\}', text, re.S)
+    return match.group(1) if match else None
+
+
+def clean_latex(text: str) -> str:
+    """TeXの本文からコマンドを除いて読めるテキストにする（インライン数式はそのまま残す）"""
+    for env in DROP_ENVIRONMENTS:
+        text = re.sub(r'\\begin\{' + re.escape(env) + r'\}.*?\\end\{' + re.escape(env) + r'\}', ' ', text, flags=re.S)
+    text = re.sub(r'\\(?:begin|end)\{[^}]*\}(?:\[[^\]]*\])?', ' ', text)
+    parts = INLINE_MATH_RE.split(text)
+    # 奇数番目はインライン数式
+    parts[::2] = [_strip_commands(part) for part in parts[::2]]
+    return re.sub(r'[ \t]+', ' ', ''.join(parts))
+
+
+def _strip_commands(text: str) -> str:
+    for command in DROP_COMMANDS:
+        # 直前の空白・~ も除き、"architecture ." のような残りが出ないようにする
+        text = re.sub(r'[ \t~]*\\' + command + r'\*?\s*(?:\[[^\]]*\])*\s*\{[^{}]*\}', '', text)
+    # \textbf{x} などは中身だけ残す（入れ子に対応するため変化がなくなるまで繰り返す）
+    previous = None
+    while previous != text:
+        previous = text
+        text = TEXT_COMMAND_RE.sub(r'\1', text)
+    text = BARE_COMMAND_RE.sub('', text)
+    text = text.replace('~', ' ').replace('{', '').replace('}', '')
+    return re.sub(r'\\([%&_#$])', r'\1', text)
+
+
+def _paragraphs(text: str) -> List[str]:
+    paragraphs = []
+    for block in re.split(r'\n\s*\n', clean_latex(text)):
+        paragraph = ' '.join(line.strip() for line in block.splitlines() if line.strip())
+        if paragraph:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+
+def extract_latex_text(files: Dict[str, str]) -> Optional[str]:
+    """TeXソースからタイトル・アブストラクト・セクション別の本文を抽出
+
+    出力はJATSからの抽出（jats_extractor）と同じく "Title:"・"Abstract:"・"Section:" で区切る。
+    """
+    main = _find_main(files)
+    if main is None:
+        return None
+    source = _resolve_inputs(COMMENT_RE.sub('', files[main]), files)
+
+    title = _command_argument(source, 'title')
+    body_start = source.find('\\begin{document}')
+    body_end = source.find('\\end{document}')
+    body = source[body_start + len('\\begin{document}'):body_end if body_end != -1 else None]
+    abstract = _environment(body, 'abstract')
+    if abstract is not None:
+        body = body.replace(abstract, '', 1)
+    # 参考文献以降は使わない
+    for marker in ('\\bibliography{', '\\begin{thebibliography}', '\\appendix'):
+        position = body.find(marker)
+        if position != -1:
+            body = body[:position]
+
+    sections = []
+    if title:
+        sections.append(f"Title: {' '.join(clean_latex(title).split())}")
+    if abstract:
+        sections.append("\nAbstract:")
+        sections.append(' '.join(_paragraphs(abstract)))
+
+    matches = list(SECTION_RE.finditer(body))
+    sections.extend(_paragraphs(body[:matches[0].start()] if matches else body))
+    for i, match in enumerate(matches):
+        heading, heading_end = _braced(body, match.end() - 1)
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(body)
+        sections.append(f"\nSection: {' '.join(clean_latex(heading).split())}")
+        sections.extend(_paragraphs(body[heading_end:end]))
+    return '\n\n'.join(filter(None, sections)) or None
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+from .content_store import ContentStore, get_cache_dir
+
+NAMESPACE = 'llm'
+DEFAULT_TTL = 30 * 86400
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+class LLMCache:
+    """モデルID・プロンプト・生成パラメータをキーとするLLM出力のディスクキャッシュ"""
+
+    def __init__(self, store: Optional[ContentStore] = None):
+        if store is None:
+            store = ContentStore(
+                db_path=get_cache_dir() / 'llm_cache.sqlite3',
+                max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                ttls={NAMESPACE: float(os.getenv('LLM_CACHE_TTL', DEFAULT_TTL))}
+            )
+        self.store = store
+
+    @staticmethod
+    def make_key(model_id: str, request_body: bytes) -> str:
+        """リクエストボディ（プロンプトと生成パラメータを含む）とモデルIDのハッシュ"""
+        digest = hashlib.sha256()
+        digest.update((model_id or '').encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(request_body)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """キャッシュ済みの出力を取得し、節約できたトークン数を記録"""
+        value = self.store.get(NAMESPACE, key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        # ヒットの記録と同じ書き込みにまとめる（ヒットごとにコミットしない）
+        self.store.incr_stats({'input_tokens_saved': entry.get('input_tokens', 0),
+                               'output_tokens_saved': entry.get('output_tokens', 0)})
+        return entry['text']
+
+    def set(self, key: str, text: str, usage: Optional[Dict] = None):
+        usage = usage or {}
+        self.store.set(NAMESPACE, key, json.dumps({
+            'text': text,
+            'input_tokens': usage.get('input_tokens', 0),
+            'output_tokens': usage.get('output_tokens', 0)
+        }, ensure_ascii=False))
+
+    def stats(self) -> Dict:
+        """ヒット率と節約できたトークン数を含む統計"""
+        stats = self.store.stats()
+        stats.setdefault('input_tokens_saved', 0)
+        stats.setdefault('output_tokens_saved', 0)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['tokens_saved'] = stats['input_tokens_saved'] + stats['output_tokens_saved']
+        return stats
+
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> LLMCache:
+    """プロセス全体で共有されるLLM出力キャッシュを取得"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache()
+        return _cache
@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'paper_assistant_'
+# 秒単位のヒストグラムのバケット境界
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+
+# 無効時は各関数の先頭でこのフラグだけを見て戻る
+_enabled = _env_flag('METRICS_ENABLED') or bool(os.getenv('METRICS_PORT')) or _env_flag('METRICS_JSON_LOG')
+_json_log = _env_flag('METRICS_JSON_LOG')
+
+
+class _Histogram:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Registry:
+    """カウンタとヒストグラムを保持し、Prometheusのテキスト形式で出力する"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters: Dict[str, Dict[LabelKey, float]] = {}
+        self.histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self.lock = threading.Lock()
+
+    def incr(self, name: str, amount: float, labels: LabelKey):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + amount
+
+    def observe(self, name: str, value: float, labels: LabelKey):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(labels)
+            if histogram is None:
+                histogram = series[labels] = _Histogram(len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram.counts[i] += 1
+                    break
+            histogram.sum += value
+            histogram.count += 1
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式（text/plain; version=0.0.4）"""
+        lines: List[str] = []
+        with self.lock:
+            for name in sorted(self.counters):
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                for labels, value in sorted(self.counters[name].items()):
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+            for name in sorted(self.histograms):
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                for labels, histogram in sorted(self.histograms[name].items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, histogram.counts):
+                        cumulative += count
+                        bucket_labels = labels + (('le', _format_value(bound)),)
+                        lines.append(f"{PREFIX}{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                    inf_labels = labels + (('le', '+Inf'),)
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(inf_labels)} {histogram.count}")
+                    lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+                    lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+registry = Registry()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def configure(enabled: bool = True, json_log: Optional[bool] = None):
+    """計測の有効・無効とJSONログ出力を切り替える（環境変数の設定より優先）"""
+    global _enabled, _json_log
+    _enabled = enabled
+    if json_log is not None:
+        _json_log = json_log
+
+
+def _log_event(kind: str, name: str, value: float, labels: Dict[str, object]):
+    logger.info(json.dumps({
+        'ts': time.time(), 'type': kind, 'metric': name, 'value': value,
+        'labels': {key: str(val) for key, val in labels.items()},
+    }, ensure_ascii=False))
+
+
+def incr(name: str, amount: float = 1, **labels):
+    """カウンタを加算"""
+    if not _enabled:
+        return
+    registry.incr(name, amount, _label_key(labels))
+    if _json_log:
+        _log_event('counter', name, amount, labels)
+
+
+def observe(name: str, seconds: float, **labels):
+    """所要時間（秒）をヒストグラムに記録"""
+    if not _enabled:
+        return
+    registry.observe(name, seconds, _label_key(labels))
+    if _json_log:
+        _log_event('histogram', name, seconds, labels)
+
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name: str, labels: Dict[str, object]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str, **labels):
+    """withブロックの所要時間を記録するコンテキストマネージャ（無効時は何もしない）"""
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: Optional[int] = None, host: Optional[str] = None) -> Optional[ThreadingHTTPServer]:
+    """/metrics を返すHTTPサーバーを起動（METRICS_PORT未設定なら起動しない、起動済みなら既存を返す）"""
+    global _server
+    if port is None:
+        port = int(os.getenv('METRICS_PORT') or 0)
+        if not port:
+            return None
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host or os.getenv('METRICS_HOST', '127.0.0.1'), port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='metrics-server', daemon=True).start()
+            configure(True)
+        return _server
+
+
+if _json_log and not logger.handlers:
+    # JSONログは1行1イベントで、アプリ側のログ設定に依存せず出力する
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
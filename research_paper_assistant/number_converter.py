@@ -1,3 +1,4 @@
+import re
 from typing import List
 
 class NumberConverter:
@@ -9,16 +10,21 @@ class NumberConverter:
     }
     
     ARABIC_TO_ROMAN = {v: k for k, v in ROMAN_NUMS.items()}
+
+    # Roman numerals only count as whole words ("ii" in "type ii", not the "i" in "brain")
+    NUMBER_RE = re.compile(r'\d|\b(?:' + '|'.join(sorted(ROMAN_NUMS, key=len, reverse=True)) + r')\b',
+                           re.IGNORECASE)
     
     @staticmethod
     def contains_number(text: str) -> bool:
         """Check if text contains any number (roman or arabic)"""
-        text = text.lower()
-        # Check for arabic numbers
-        if any(c.isdigit() for c in text):
-            return True
-        # Check for roman numbers
-        return any(roman in text for roman in NumberConverter.ROMAN_NUMS.keys())
+        return NumberConverter.NUMBER_RE.search(text) is not None
+
+    @staticmethod
+    def is_number(word: str) -> bool:
+        """Check if a single word is an arabic or roman number"""
+        word = word.lower()
+        return word.isdigit() or word in NumberConverter.ROMAN_NUMS
     
     @staticmethod
     def get_all_number_variants(query: str) -> List[str]:
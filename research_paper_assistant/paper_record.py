@@ -0,0 +1,63 @@
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class PaperRecord:
+    """検索結果の1件（アプリが使う項目だけを__slots__で保持し、上流の生データは持たない）
+
+    既存のコードが辞書として扱えるよう、paper['title'] や paper.get('doi') でも参照できる。
+    """
+    # Python 3.8でも使えるよう、dataclass(slots=True) ではなく明示的に定義
+    __slots__ = ('id', 'title', 'authors', 'summary', 'pdf_url', 'published', 'source',
+                 'primary_category', 'doi', 'pmc_id')
+
+    id: str
+    title: str
+    authors: str
+    summary: str
+    pdf_url: str
+    published: str
+    source: str
+    primary_category: str
+    doi: Optional[str]
+    pmc_id: Optional[str]
+
+    @classmethod
+    def create(cls, id: str, title: str, authors: str, summary: str, pdf_url: str, published: str,
+               source: str, primary_category: str, doi: Optional[str] = None,
+               pmc_id: Optional[str] = None) -> 'PaperRecord':
+        """doi・pmc_idを省略可能にした生成関数（__slots__のクラスではフィールドに既定値を置けないため）"""
+        return cls(id, title, authors, summary, pdf_url, published, source, primary_category, doi, pmc_id)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.__slots__
+
+    def keys(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def to_tuple(self) -> Tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'PaperRecord':
+        return cls(*(data.get(name) for name in cls.__slots__))
+
+    def __reduce__(self):
+        # frozenのため属性の再設定を伴う既定のpickleは使えない。値のタプルだけを渡す
+        return (self.__class__, self.to_tuple())
+
+
+# __slots__ とフィールドの並びが一致していること（to_tuple・from_dictが依存する）
+assert PaperRecord.__slots__ == tuple(field.name for field in fields(PaperRecord))
@@ -1,102 +1,128 @@
-import arxiv
+import base64
+import copy
+import json
 import requests
-from typing import List, Dict, Optional, Tuple
-from datetime import datetime
+from typing import IO, Iterator, List, Dict, Optional, Tuple, Union
+from datetime import datetime, timedelta
 from dateutil import parser
 from .number_converter import NumberConverter
-import re
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
-import time
-import json
+from .query_matcher import compile_query
+from .biorxiv_index import BiorxivIndex, BiorxivHarvester
 import os
-from pathlib import Path
+import re
+import tempfile
+import threading
+from .http_client import get_ncbi_api_key, request, wait_for_rate_limit
+from . import metrics
+from .content_store import get_content_store
+from .jats_extractor import extract_text
+from .latex_extractor import extract_latex_text, unpack_source
+from .paper_record import PaperRecord
+
+# 1ページ分の検索結果と、次のページのカーソル（最後のページならNone）
+SearchPage = Tuple[List[PaperRecord], Optional[str]]
+
+DEFAULT_PAGE_SIZE = 10
+# 並び順（Noneは関連度順）
+SORT_NEWEST = 'newest'
+# 上流APIの生の応答を論文ごとにキャッシュへ保存するか（デバッグ用。通常は保持しない）
+KEEP_RAW_RESULTS = os.getenv('KEEP_RAW_RESULTS', '').lower() in ('1', 'true', 'yes', 'on')
+# arXiv APIの検索が失敗したときの再試行回数（各試行の前にレート制限で待つ）
+ARXIV_RETRIES = 3
+# bioRxivのインデックス構築中に、1ページ分の結果を集めるため走査するdetails APIのページ数の上限
+RECENT_SCAN_PAGES = 5
+
+
+def encode_cursor(state: Dict) -> str:
+    """ソースごとのページ位置を、呼び出し側からは中身を扱わない文字列にする"""
+    return base64.urlsafe_b64encode(json.dumps(state, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: Optional[str]) -> Dict:
+    if not cursor:
+        return {}
+    return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+
 
 class PaperSource:
-    def search(self, query: str, max_results: int) -> List[Dict]:
+    api_name = ''  # レート制限を共有するAPI名
+    source_name = ''  # 検索結果のsourceに入る表示名
+    cache_namespace = ''  # 本文キャッシュの名前空間
+
+    def search_page(self, query: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                    sort_order: Optional[str] = None) -> SearchPage:
+        """cursorの位置から1ページ分を検索（cursorがNoneなら先頭のページ、sort_orderがSORT_NEWESTなら新しい順）"""
         raise NotImplementedError
+
+    def search_pages(self, query: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                     sort_order: Optional[str] = None) -> Iterator[SearchPage]:
+        """(結果, 次のページのカーソル) を1ページずつ返すジェネレーター（次のページは要求されたときに取得）"""
+        while True:
+            papers, cursor = self.search_page(query, page_size, cursor, sort_order)
+            yield papers, cursor
+            if cursor is None:
+                return
+
+    def search(self, query: str, max_results: int) -> List[PaperRecord]:
+        """先頭からmax_results件を検索"""
+        papers, _ = self.search_page(query, max_results)
+        return papers
         
     def get_full_text(self, paper: Dict) -> Optional[str]:
         raise NotImplementedError
 
-    def _get_cache_dir(self) -> Path:
-        """Get or create cache directory"""
-        cache_dir = Path.home() / '.paper_assistant_cache'
-        cache_dir.mkdir(exist_ok=True)
-        return cache_dir
+    def _wait_for_rate_limit(self):
+        """API単位でプロセス全体に共有されるレート制限のための待機"""
+        wait_for_rate_limit(self.api_name)
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """レート制限を適用し、共有のkeep-aliveセッションでリクエスト"""
+        return request(method, url, api=self.api_name, **kwargs)
+
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        return self._request('GET', url, **kwargs)
+
+    def _make_record(self, raw: Dict, **fields) -> PaperRecord:
+        """検索結果の1件をアプリが使う項目だけのレコードにする（生の応答はKEEP_RAW_RESULTSのときだけ保存）"""
+        record = PaperRecord.create(source=self.source_name, **fields)
+        if KEEP_RAW_RESULTS:
+            get_content_store().set(f"raw:{self.cache_namespace}", record.id,
+                                    json.dumps(raw, ensure_ascii=False, default=str))
+        return record
+
+    def get_raw_data(self, paper_id: str) -> Optional[Dict]:
+        """保存してある上流APIの生の応答を読み込む（保存していなければNone）"""
+        value = get_content_store().get(f"raw:{self.cache_namespace}", paper_id)
+        return json.loads(value) if value is not None else None
 
     def _get_cached_content(self, key: str) -> Optional[str]:
         """Get content from cache if available"""
-        cache_file = self._get_cache_dir() / f"{key}.json"
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # 24時間以内のキャッシュのみ使用
-                    if time.time() - data['timestamp'] < 86400:
-                        return data['content']
-            except Exception:
-                pass
-        return None
+        return get_content_store().get(self.cache_namespace, key)
 
     def _cache_content(self, key: str, content: str):
-        """Cache content with timestamp"""
-        cache_file = self._get_cache_dir() / f"{key}.json"
-        try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    'content': content,
-                    'timestamp': time.time()
-                }, f, ensure_ascii=False)
-        except Exception as e:
-            print(f"Cache write error: {e}")
-
-    def _extract_text_from_xml(self, soup: BeautifulSoup) -> str:
-        """XMLから本文を抽出する共通メソッド"""
-        sections = []
-        
-        # タイトルを追加
-        title = soup.find('article-title')
-        if title:
-            sections.append(f"Title: {title.text}")
-        
-        # アブストラクトを追加
-        abstract = soup.find('abstract')
-        if abstract:
-            sections.append("\nAbstract:")
-            sections.append(abstract.get_text(strip=True))
-        
-        # 本文セクションを取得
-        body = soup.find('body')
-        if body:
-            sections.extend(self._process_section(body))
-        
-        return '\n\n'.join(filter(None, sections))
+        """Cache content (TTL is configured per source namespace)"""
+        get_content_store().set(self.cache_namespace, key, content)
 
-    def _process_section(self, element: BeautifulSoup) -> List[str]:
-        """XMLセクションを再帰的に処理"""
-        sections = []
-        
-        # セクションタイトルの処理
-        title = element.find('title', recursive=False)
-        if title:
-            sections.append(f"\nSection: {title.text.strip()}")
-        
-        # 段落の処理
-        for p in element.find_all('p', recursive=False):
-            text = p.get_text(separator=' ', strip=True)
-            if text:
-                sections.append(text)
-        
-        # サブセクションの再帰的処理
-        for subsec in element.find_all('sec', recursive=False):
-            sections.extend(self._process_section(subsec))
-        
-        return sections
+    def _extract_text_from_xml(self, xml: Union[bytes, IO[bytes]]) -> str:
+        """XMLから本文を抽出する共通メソッド（lxmlで1パスのストリーミング処理）"""
+        with metrics.timer('stage_seconds', stage='jats_extract', source=self.api_name):
+            return extract_text(xml)
 
 class ArxivSource(PaperSource):
+    api_name = 'arxiv'
+    source_name = 'arXiv'
+    cache_namespace = 'arxiv'
+
     def __init__(self):
+        import arxiv  # arXivを使うときだけ読み込む
+
         self.number_converter = NumberConverter()
+        # ページングの待機はレートリミッター側で行う。再試行もレート制限を通すよう、ライブラリの再試行は使わない
+        self.client = arxiv.Client(delay_seconds=0, num_retries=0)
+        self.eprint_url = "https://arxiv.org/e-print"
+        self.pdf_url = "https://arxiv.org/pdf"
+        # 本文取得でダウンロードするソース・PDFのサイズ上限
+        self.max_download_bytes = int(os.getenv('ARXIV_FULLTEXT_MAX_BYTES', 30 * 1024 * 1024))
 
     def prepare_query(self, query: str) -> str:
         words = query.lower().split()
@@ -110,103 +136,255 @@ class ArxivSource(PaperSource):
                 processed_words.append(f"(*{word}* OR *{word.capitalize()}*)")
         return " AND ".join(processed_words)
 
-    def search(self, query: str, max_results: int = 5) -> List[Dict]:
-        processed_query = self.prepare_query(query)
+    def search_page(self, query: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                    sort_order: Optional[str] = None) -> SearchPage:
+        import arxiv
+
+        offset = decode_cursor(cursor).get('offset', 0)
         search = arxiv.Search(
-            query=processed_query,
-            max_results=max_results,
-            sort_by=arxiv.SortCriterion.Relevance
+            query=self.prepare_query(query),
+            max_results=offset + page_size,
+            sort_by=(arxiv.SortCriterion.SubmittedDate if sort_order == SORT_NEWEST
+                     else arxiv.SortCriterion.Relevance)
         )
-        
+        # 1ページを1リクエストで取得するよう、APIへ要求する件数をページサイズに合わせる
+        client = copy.copy(self.client)
+        client.page_size = page_size
+
         results = []
-        for paper in search.results():
-            results.append({
-                'title': paper.title,
-                'authors': ', '.join([author.name for author in paper.authors]),
-                'summary': paper.summary,
-                'pdf_url': paper.pdf_url,
-                'published': paper.published.strftime('%Y-%m-%d'),
-                'id': paper.entry_id.split('abs/')[-1],
-                'source': 'arXiv',
-                'primary_category': paper.primary_category,
-                'categories': paper.categories,
-                'raw_data': paper
-            })
-        return results
+        for paper in self._fetch_results(client, search, offset):
+            results.append(self._make_record(
+                self._raw_result(paper) if KEEP_RAW_RESULTS else {},
+                title=paper.title,
+                authors=', '.join([author.name for author in paper.authors]),
+                summary=paper.summary,
+                pdf_url=paper.pdf_url,
+                published=paper.published.strftime('%Y-%m-%d'),
+                id=paper.entry_id.split('abs/')[-1],
+                doi=paper.doi,
+                primary_category=paper.primary_category
+            ))
+        next_cursor = encode_cursor({'offset': offset + page_size}) if len(results) == page_size else None
+        return results, next_cursor
+
+    def _fetch_results(self, client, search, offset: int) -> List:
+        """1ページ分を取得（HTTPエラー・空のページは、レート制限の待機を挟んで再試行する）"""
+        import arxiv
+
+        for attempt in range(ARXIV_RETRIES + 1):
+            self._wait_for_rate_limit()
+            try:
+                return list(client.results(search, offset=offset))
+            except (arxiv.HTTPError, arxiv.UnexpectedEmptyPageError, requests.exceptions.ConnectionError) as e:
+                if attempt == ARXIV_RETRIES:
+                    raise
+                print(f"arXiv search failed, retrying ({attempt + 1}/{ARXIV_RETRIES}): {e}")
+        return []
+
+    @staticmethod
+    def _raw_result(paper) -> Dict:
+        """arxiv.ResultをJSONで保存できる辞書にする"""
+        return {
+            'entry_id': paper.entry_id,
+            'updated': paper.updated.isoformat(),
+            'published': paper.published.isoformat(),
+            'title': paper.title,
+            'authors': [author.name for author in paper.authors],
+            'summary': paper.summary,
+            'comment': paper.comment,
+            'journal_ref': paper.journal_ref,
+            'doi': paper.doi,
+            'primary_category': paper.primary_category,
+            'categories': paper.categories,
+            'links': [link.href for link in paper.links],
+        }
+
+    def _download(self, url: str) -> Optional[str]:
+        """応答をストリーミングで一時ファイルに保存してパスを返す（サイズ上限を超える場合はNone）"""
+        with self._get(url, stream=True) as response:
+            if not response.ok:
+                return None
+            length = response.headers.get('Content-Length')
+            if length and int(length) > self.max_download_bytes:
+                print(f"arXiv download exceeds size limit: {url} ({length} bytes)")
+                return None
+            fd, path = tempfile.mkstemp(prefix='arxiv_')
+            size = 0
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_download_bytes:
+                        break
+                    f.write(chunk)
+        if size > self.max_download_bytes:
+            print(f"arXiv download exceeds size limit: {url}")
+            os.unlink(path)
+            return None
+        return path
+
+    def _extract_pdf(self, path: str, paper: Dict) -> Optional[str]:
+        from .pdf_extractor import extract_pdf_text  # pypdfはPDFを扱うときだけ読み込む
+
+        with metrics.timer('stage_seconds', stage='pdf_extract', source=self.api_name):
+            return extract_pdf_text(path, paper.get('title'), paper.get('summary'))
+
+    def _full_text_from_source(self, paper: Dict) -> Optional[str]:
+        """e-print（TeXソース）から本文を抽出（PDFのみの投稿ならそのPDFから抽出）"""
+        path = self._download(f"{self.eprint_url}/{paper['id']}")
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if data[:5] == b'%PDF-':
+                return self._extract_pdf(path, paper)
+            with metrics.timer('stage_seconds', stage='latex_extract', source=self.api_name):
+                return extract_latex_text(unpack_source(data))
+        finally:
+            os.unlink(path)
+
+    def _full_text_from_pdf(self, paper: Dict) -> Optional[str]:
+        path = self._download(f"{self.pdf_url}/{paper['id']}")
+        if path is None:
+            return None
+        try:
+            return self._extract_pdf(path, paper)
+        finally:
+            os.unlink(path)
 
     def get_full_text(self, paper: Dict) -> Optional[str]:
-        return None  # arXivは本文取得を実装しない
+        try:
+            paper_id = paper['id']
+
+            # キャッシュをチェック
+            cached_content = self._get_cached_content(paper_id)
+            if cached_content:
+                return cached_content
+
+            # 見出しを正確に取れるTeXソースを優先し、抽出できなければPDFを使う
+            content = self._full_text_from_source(paper)
+            if not content:
+                content = self._full_text_from_pdf(paper)
+
+            # キャッシュに保存
+            if content:
+                self._cache_content(paper_id, content)
+
+            return content
+
+        except Exception as e:
+            print(f"Error getting arXiv full text: {e}")
+            return None
 
 class BiorxivSource(PaperSource):
+    api_name = 'biorxiv'
+    source_name = 'bioRxiv'
+    cache_namespace = 'biorxiv'
+
     def __init__(self):
         self.base_url = "https://api.biorxiv.org/details/biorxiv"
+        self.content_url = "https://www.biorxiv.org/content"
         self.number_converter = NumberConverter()
-        self.last_request_time = 0
-        self.min_request_interval = 1.0  # 1秒間隔でリクエスト
+        self.index = BiorxivIndex()
+        self.harvester = BiorxivHarvester(self.index, self._fetch_details_page)
 
-    def _wait_for_rate_limit(self):
-        """レート制限のための待機"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last_request)
-        self.last_request_time = time.time()
-
-    def search(self, query: str, max_results: int = 5) -> List[Dict]:
-        self._wait_for_rate_limit()
-        response = requests.get(f"{self.base_url}/2024-01-01/2024-12-31/0/200")
-        if response.status_code != 200 or 'collection' not in response.json():
-            return []
-
-        def matches_query(text: str, q: str) -> bool:
-            if self.number_converter.contains_number(q):
-                return self.number_converter.is_number_match(text, q)
-            return q.lower() in text.lower()
-
-        filtered_papers = []
-        for paper in response.json()['collection']:
-            if matches_query(paper.get('title', ''), query) or matches_query(paper.get('abstract', ''), query):
-                filtered_papers.append(paper)
-                if len(filtered_papers) >= max_results:
-                    break
-
-        return [{
-            'title': paper.get('title', 'No title'),
-            'authors': paper.get('authors', 'No authors'),
-            'summary': paper.get('abstract', 'No abstract available'),
-            'pdf_url': f"https://www.biorxiv.org/content/{paper.get('doi')}v1.full.pdf",
-            'published': parser.parse(paper['date']).strftime('%Y-%m-%d') if paper.get('date') else 'Unknown date',
-            'id': paper.get('doi', ''),
-            'source': 'bioRxiv',
-            'primary_category': paper.get('category', 'Biology'),
-            'categories': [paper.get('category', 'Biology')],
-            'raw_data': paper
-        } for paper in filtered_papers]
+    def _fetch_details_page(self, start: str, end: str, cursor: int) -> Optional[Dict]:
+        """details APIから指定期間・カーソル位置の1ページを取得"""
+        response = self._get(f"{self.base_url}/{start}/{end}/{cursor}")
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        return data if 'collection' in data else None
+
+    def search(self, query: str, max_results: int = 5, date_from: Optional[str] = None,
+               date_to: Optional[str] = None) -> List[PaperRecord]:
+        papers, _ = self.search_page(query, max_results, date_from=date_from, date_to=date_to)
+        return papers
+
+    def search_page(self, query: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                    sort_order: Optional[str] = None, date_from: Optional[str] = None,
+                    date_to: Optional[str] = None) -> SearchPage:
+        # 初回の検索で収集スレッドを開始（以降は何もしない）
+        self.harvester.start()
+
+        state = decode_cursor(cursor)
+        # ローカルインデックスが構築済みならそこから検索（途中のページは最初のページと同じ方法で続ける）
+        if state.get('mode') == 'index' or (not state and self.index.get_state('harvested_until')):
+            offset = state.get('offset', 0)
+            papers = self.index.search(query, page_size, date_from=date_from, date_to=date_to, offset=offset,
+                                       newest_first=sort_order == SORT_NEWEST)
+            next_cursor = (encode_cursor({'mode': 'index', 'offset': offset + page_size})
+                           if len(papers) == page_size else None)
+        else:
+            # 構築中の走査はdetails APIの順（投稿日順）に返すため、並び順は指定できない
+            papers, next_cursor = self._search_recent(query, page_size, state)
+        return [self._format_paper(paper) for paper in papers], next_cursor
+
+    def _search_recent(self, query: str, max_results: int, state: Optional[Dict] = None,
+                       max_pages: int = RECENT_SCAN_PAGES) -> Tuple[List[Dict], Optional[str]]:
+        """インデックスの初回構築中は直近の投稿を直接走査（1回に走査するのはmax_pagesページまで）"""
+        state = state or {}
+        end = state.get('end') or datetime.now().date().isoformat()
+        start = state.get('start') or (parser.parse(end).date() - timedelta(days=30)).isoformat()
+        api_cursor = state.get('cursor', 0)
+        skip = state.get('skip', 0)  # 同じページで前回までに返した一致件数
+
+        # 検索語は一度だけコンパイルし、各論文のタイトルとアブストラクトを1回のマッチで判定
+        matcher = compile_query(query)
+        papers: List[Dict] = []
+        for _ in range(max_pages):
+            data = self._fetch_details_page(start, end, api_cursor)
+            if not data:
+                return papers, None
+            matched = matcher.filter(data['collection'], ('title', 'abstract'))[skip:]
+            needed = max_results - len(papers)
+            papers.extend(matched[:needed])
+            if len(matched) > needed:
+                skip += needed
+                break
+            skip = 0
+            api_cursor += len(data['collection'])
+            total = int((data.get('messages') or [{}])[0].get('total', 0) or 0)
+            if not data['collection'] or api_cursor >= total:
+                return papers, None
+            if len(papers) >= max_results:
+                break
+        return papers, encode_cursor({'mode': 'recent', 'start': start, 'end': end,
+                                      'cursor': api_cursor, 'skip': skip})
+
+    def _format_paper(self, paper: Dict) -> PaperRecord:
+        return self._make_record(
+            paper,
+            title=paper.get('title', 'No title'),
+            authors=paper.get('authors', 'No authors'),
+            summary=paper.get('abstract', 'No abstract available'),
+            pdf_url=f"https://www.biorxiv.org/content/{paper.get('doi')}v{paper.get('version', 1)}.full.pdf",
+            published=parser.parse(paper['date']).strftime('%Y-%m-%d') if paper.get('date') else 'Unknown date',
+            id=paper.get('doi', ''),
+            doi=paper.get('doi'),
+            primary_category=paper.get('category', 'Biology')
+        )
 
     def get_full_text(self, paper: Dict) -> Optional[str]:
         try:
             paper_id = paper['id']
             
             # キャッシュをチェック
-            cached_content = self._get_cached_content(f"biorxiv_{paper_id}")
+            cached_content = self._get_cached_content(paper_id)
             if cached_content:
                 return cached_content
 
-            self._wait_for_rate_limit()
-            
-            # bioRxiv XMLを取得
-            xml_url = f"https://www.biorxiv.org/content/{paper_id}.xml"
-            response = requests.get(xml_url)
-            if not response.ok:
-                return None
-
-            # XMLをパースして本文を抽出
-            soup = BeautifulSoup(response.content, 'xml')
-            content = self._extract_text_from_xml(soup)
+            # bioRxiv XMLを取得し、受信しながらパースして本文を抽出
+            xml_url = f"{self.content_url}/{paper_id}.xml"
+            with self._get(xml_url, stream=True) as response:
+                if not response.ok:
+                    return None
+                response.raw.decode_content = True
+                content = self._extract_text_from_xml(response.raw)
             
             # キャッシュに保存
             if content:
-                self._cache_content(f"biorxiv_{paper_id}", content)
+                self._cache_content(paper_id, content)
             
             return content
 
@@ -215,85 +393,171 @@ class BiorxivSource(PaperSource):
             return None
 
 class PubmedSource(PaperSource):
+    api_name = 'ncbi'  # NCBI API制限: APIキーなし3リクエスト/秒、あり10リクエスト/秒
+    source_name = 'PubMed'
+    cache_namespace = 'pubmed'
+
     def __init__(self):
         self.base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
         self.number_converter = NumberConverter()
-        self.last_request_time = 0
-        self.min_request_interval = 0.34  # NCBI API制限: 3リクエスト/秒
 
-    def _wait_for_rate_limit(self):
-        """レート制限のための待機"""
-        current_time = time.time()
-        time_since_last_request = current_time - self.last_request_time
-        if time_since_last_request < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last_request)
-        self.last_request_time = time.time()
-
-    def search(self, query: str, max_results: int = 5) -> List[Dict]:
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """APIキーが設定されていればE-utilitiesのパラメータに付与"""
+        api_key = get_ncbi_api_key()
+        if api_key:
+            field = 'data' if method == 'POST' else 'params'
+            kwargs[field] = {**(kwargs.get(field) or {}), "api_key": api_key}
+        return super()._request(method, url, **kwargs)
+
+    def search_page(self, query: str, page_size: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None,
+                    sort_order: Optional[str] = None) -> SearchPage:
         try:
-            self._wait_for_rate_limit()
+            retstart = decode_cursor(cursor).get('retstart', 0)
             search_params = {
                 "db": "pubmed",
                 "term": query,
-                "retmax": max_results,
+                "retstart": retstart,
+                "retmax": page_size,
                 "retmode": "json"
             }
-            search_response = requests.get(f"{self.base_url}/esearch.fcgi", params=search_params)
+            if sort_order == SORT_NEWEST:
+                search_params["sort"] = "pub_date"
+
+            search_response = self._get(f"{self.base_url}/esearch.fcgi", params=search_params)
             if not search_response.ok:
-                return []
+                return [], None
 
             search_data = search_response.json()
             if 'esearchresult' not in search_data or 'idlist' not in search_data['esearchresult']:
-                return []
+                return [], None
 
-            results = []
-            for pmid in search_data['esearchresult']['idlist']:
-                self._wait_for_rate_limit()
-                summary_params = {"db": "pubmed", "id": pmid, "retmode": "json"}
-                summary_response = requests.get(f"{self.base_url}/esummary.fcgi", params=summary_params)
-                if not summary_response.ok:
-                    continue
+            esearch_result = search_data['esearchresult']
+            pmids = esearch_result['idlist']
+            if not pmids:
+                return [], None
+            next_start = retstart + len(pmids)
+            next_cursor = (encode_cursor({'retstart': next_start})
+                           if next_start < int(esearch_result.get('count', 0)) else None)
+
+            # 書誌情報・アブストラクト・PMC IDをそれぞれ1リクエストでまとめて取得
+            summaries = self._fetch_summaries(pmids)
+            abstracts = self._fetch_abstracts(pmids)
+            pmc_ids = self._get_pmc_ids(pmids)
 
-                details = summary_response.json()
-                if 'result' not in details or pmid not in details['result']:
+            results = []
+            for pmid in pmids:
+                paper = summaries.get(pmid)
+                if not paper:
                     continue
 
-                paper = details['result'][pmid]
                 authors = [author.get('name', '') for author in paper.get('authors', []) if author.get('name')]
 
-                # PMC IDを取得
-                pmc_id = self._get_pmc_id(pmid)
-
-                results.append({
-                    'title': paper.get('title', 'No title').strip(),
-                    'authors': ', '.join(authors),
-                    'summary': paper.get('abstract', 'No abstract available'),
-                    'pdf_url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-                    'published': paper.get('pubdate', 'Unknown date'),
-                    'id': pmid,
-                    'source': 'PubMed',
-                    'primary_category': 'Medicine',
-                    'categories': ['Medicine'],
-                    'raw_data': paper,
-                    'pmc_id': pmc_id
-                })
-            return results
+                results.append(self._make_record(
+                    paper,
+                    title=paper.get('title', 'No title').strip(),
+                    authors=', '.join(authors),
+                    summary=abstracts.get(pmid) or 'No abstract available',
+                    pdf_url=f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
+                    published=paper.get('pubdate', 'Unknown date'),
+                    id=pmid,
+                    doi=next((a.get('value') for a in paper.get('articleids', []) if a.get('idtype') == 'doi'), None),
+                    primary_category='Medicine',
+                    pmc_id=pmc_ids.get(pmid)
+                ))
+            return results, next_cursor
 
         except Exception as e:
             print(f"PubMed search error: {e}")
-            return []
+            return [], None
+
+    def _fetch_summaries(self, pmids: List[str]) -> Dict[str, Dict]:
+        """複数PMIDの書誌情報を1回のesummaryで取得（1ページは最大50件のため、IDはURLに列挙する）"""
+        try:
+            params = {"db": "pubmed", "retmode": "json", "id": ','.join(pmids)}
+            response = self._get(f"{self.base_url}/esummary.fcgi", params=params)
+            if not response.ok:
+                return {}
+
+            result = response.json().get('result', {})
+            return {uid: result[uid] for uid in result.get('uids', []) if uid in result}
+
+        except Exception as e:
+            print(f"PubMed summary error: {e}")
+            return {}
+
+    def _fetch_abstracts(self, pmids: List[str]) -> Dict[str, str]:
+        """複数PMIDのアブストラクトを1回のefetchで取得（esummaryには含まれないため）"""
+        try:
+            params = {
+                "db": "pubmed",
+                "rettype": "abstract",
+                "retmode": "xml",
+                "id": ','.join(pmids)
+            }
+            response = self._get(f"{self.base_url}/efetch.fcgi", params=params)
+            if not response.ok:
+                return {}
+
+            from bs4 import BeautifulSoup  # PubMedの検索時だけ読み込む
+
+            soup = BeautifulSoup(response.content, 'xml')
+            abstracts = {}
+            for article in soup.find_all('PubmedArticle'):
+                pmid = article.find('PMID')
+                abstract = article.find('Abstract')
+                if not pmid or not abstract:
+                    continue
+
+                parts = []
+                for text in abstract.find_all('AbstractText'):
+                    label = text.get('Label')
+                    body = text.get_text(separator=' ', strip=True)
+                    parts.append(f"{label}: {body}" if label else body)
+                abstracts[pmid.text.strip()] = '\n'.join(filter(None, parts))
+            return abstracts
+
+        except Exception as e:
+            print(f"PubMed abstract error: {e}")
+            return {}
+
+    def _get_pmc_ids(self, pmids: List[str]) -> Dict[str, Optional[str]]:
+        """複数PMIDのPMC IDを1回のelinkで取得"""
+        try:
+            # idを個別のパラメータとして渡すと、PMIDごとに別のlinksetが返る
+            params = {
+                "dbfrom": "pubmed",
+                "db": "pmc",
+                "linkname": "pubmed_pmc",
+                "id": pmids,
+                "retmode": "json"
+            }
+            response = self._get(f"{self.base_url}/elink.fcgi", params=params)
+            if not response.ok:
+                return {}
+
+            pmc_ids = {}
+            for linkset in response.json().get('linksets', []):
+                ids = linkset.get('ids', [])
+                if not ids:
+                    continue
+                for link in linkset.get('linksetdbs', []):
+                    if link.get('linkname') == 'pubmed_pmc' and link.get('links'):
+                        pmc_ids[str(ids[0])] = str(link['links'][0])
+            return pmc_ids
+
+        except Exception:
+            return {}
 
     def _get_pmc_id(self, pmid: str) -> Optional[str]:
         """Get PMC ID for a given PubMed ID"""
         try:
-            self._wait_for_rate_limit()
             params = {
                 "db": "pmc",
                 "linkname": "pubmed_pmc",
                 "id": pmid,
                 "retmode": "json"
             }
-            response = requests.get(f"{self.base_url}/elink.fcgi", params=params)
+            response = self._get(f"{self.base_url}/elink.fcgi", params=params)
             if not response.ok:
                 return None
 
@@ -312,7 +576,7 @@ class PubmedSource(PaperSource):
             paper_id = paper['id']
             
             # キャッシュをチェック
-            cached_content = self._get_cached_content(f"pubmed_{paper_id}")
+            cached_content = self._get_cached_content(paper_id)
             if cached_content:
                 return cached_content
 
@@ -323,8 +587,6 @@ class PubmedSource(PaperSource):
                 if not pmc_id:
                     return None
 
-            self._wait_for_rate_limit()
-            
             # PMC APIから本文を取得
             params = {
                 "db": "pmc",
@@ -332,20 +594,40 @@ class PubmedSource(PaperSource):
                 "rettype": "xml",
                 "retmode": "xml"
             }
-            response = requests.get(f"{self.base_url}/efetch.fcgi", params=params)
-            if not response.ok:
-                return None
-
-            # XMLをパースして本文を抽出
-            soup = BeautifulSoup(response.content, 'xml')
-            content = self._extract_text_from_xml(soup)
+            # 受信しながらXMLをパースして本文を抽出
+            with self._get(f"{self.base_url}/efetch.fcgi", params=params, stream=True) as response:
+                if not response.ok:
+                    return None
+                response.raw.decode_content = True
+                content = self._extract_text_from_xml(response.raw)
             
             # キャッシュに保存
             if content:
-                self._cache_content(f"pubmed_{paper_id}", content)
+                self._cache_content(paper_id, content)
             
             return content
 
         except Exception as e:
             print(f"Error getting PMC full text: {e}")
             return None
+
+
+SOURCE_CLASSES = {
+    'arXiv': ArxivSource,
+    'bioRxiv': BiorxivSource,
+    'PubMed': PubmedSource
+}
+
+_sources: Dict[str, PaperSource] = {}
+_sources_lock = threading.Lock()
+
+
+def get_source(source_name: str) -> Optional[PaperSource]:
+    """プロセス全体で共有される論文ソースのインスタンスを取得"""
+    source_class = SOURCE_CLASSES.get(source_name)
+    if source_class is None:
+        return None
+    with _sources_lock:
+        if source_name not in _sources:
+            _sources[source_name] = source_class()
+        return _sources[source_name]
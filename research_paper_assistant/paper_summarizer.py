@@ -0,0 +1,185 @@
+import os
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from . import metrics
+from .background import get_executor
+from .passage_index import split_passages
+from .token_budget import estimate_tokens, truncate_to_tokens
+
+# 本文を分割する単位（概算トークン数）。本文がこれ以下なら分割せず1回で要約する
+CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 3000))
+# 部分要約を並列に生成するワーカー数（全セッション共通）
+MAP_WORKERS = int(os.getenv('SUMMARY_MAP_WORKERS', 4))
+# 部分要約1件の出力の上限
+MAP_MAX_TOKENS = 600
+# 最終要約のプロンプトに入れる部分要約の合計の上限（超える場合は部分要約をさらに要約する）
+REDUCE_TOKEN_BUDGET = int(os.getenv('SUMMARY_REDUCE_BUDGET', 12000))
+# 部分要約に失敗したときに代わりに使う本文の量
+FALLBACK_TOKENS = 300
+
+# 中断の確認（中断する場合は例外を送出する。JobGroup.check_cancelledなど）
+CancelCheck = Optional[Callable[[], None]]
+
+# 部分要約は出力言語によらず英語で作る（言語を切り替えても同じ部分要約をキャッシュから使える）
+MAP_PROMPT = """You are reading part of a research paper.
+
+Title: {title}
+Part: {sections}
+
+{text}
+
+Summarize this part in English in at most 8 bullet points. Keep the concrete problem, methods, datasets, \
+numbers and findings; leave out citations and general background. Output only the bullet points."""
+
+COMBINE_PROMPT = """The following are summaries of consecutive parts of the research paper "{title}".
+
+{partials}
+
+Merge them into one summary in English of at most 12 bullet points, keeping the concrete methods, \
+numbers and findings. Output only the bullet points."""
+
+# 出力言語ごとの最終要約のプロンプト
+SUMMARY_PROMPTS = {
+    '日本語': {
+        'intro': "以下の論文の要約を日本語で提供してください。専門用語は適切に説明し、研究の意義が一般の読者にも伝わるようにしてください：",
+        'metadata': "タイトル: {title}\n著者: {authors}\n原文要約: {summary}\n分野: {category}",
+        'full_text': "論文本文:",
+        'partials': "論文本文（セクションごとの要約）:",
+        'focus': "上記の内容を踏まえて、以下の点に焦点を当てて要約してください：\n"
+                 "1. 研究の背景と目的\n2. 主な手法と結果\n3. 研究の意義と今後の展望",
+    },
+    'English': {
+        'intro': "Summarize the following paper in English. Explain technical terms and make the significance "
+                 "of the work clear to a general reader:",
+        'metadata': "Title: {title}\nAuthors: {authors}\nAbstract: {summary}\nField: {category}",
+        'full_text': "Full text:",
+        'partials': "Full text (summaries by section):",
+        'focus': "Based on the above, focus the summary on:\n"
+                 "1. Background and aim of the study\n2. Main methods and results\n3. Significance and outlook",
+    },
+}
+
+
+@dataclass
+class Chunk:
+    sections: List[str]
+    text: str
+
+
+def split_chunks(text: str, max_tokens: int = CHUNK_TOKENS) -> List[Chunk]:
+    """本文をセクションの区切りを保ったまま、max_tokens以下のチャンクにまとめる（タイトル・アブストラクトは除く）"""
+    chunks: List[Chunk] = []
+    sections: List[str] = []
+    parts: List[str] = []
+    tokens = 0
+    for passage in split_passages(text):
+        if passage.section in ('Title', 'Abstract'):
+            continue
+        passage_text = truncate_to_tokens(passage.text, max_tokens)
+        passage_tokens = estimate_tokens(passage_text)
+        if parts and tokens + passage_tokens > max_tokens:
+            chunks.append(Chunk(sections, '\n\n'.join(parts)))
+            sections, parts, tokens = [], [], 0
+        if not sections or sections[-1] != passage.section:
+            sections.append(passage.section)
+            if passage.section != 'Body':
+                parts.append(f"## {passage.section}")
+        parts.append(passage_text)
+        tokens += passage_tokens
+    if parts:
+        chunks.append(Chunk(sections, '\n\n'.join(parts)))
+    return chunks
+
+
+class PaperSummarizer:
+    """論文全体の要約（map-reduce）
+
+    本文をセクション単位のチャンクに分け、各チャンクの部分要約（map）を上限付きの並列数で生成し、
+    部分要約をまとめて最終要約のプロンプト（reduce）を作る。部分要約はLLMキャッシュに保存されるため、
+    要約のやり直しや出力言語の切り替えでは再利用される。
+    """
+
+    def __init__(self, bedrock, max_workers: int = MAP_WORKERS):
+        self.bedrock = bedrock
+        self.executor = get_executor('summary_map', max_workers)
+
+    @staticmethod
+    def _gather(futures: List[Future]) -> List:
+        """結果を順に待つ（失敗・中断した場合は、まだ始まっていない残りを取り消す）"""
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _map(self, title: str, chunk: Chunk, check_cancelled: CancelCheck = None) -> str:
+        if check_cancelled:
+            check_cancelled()
+        prompt = MAP_PROMPT.format(title=title, sections=', '.join(chunk.sections), text=chunk.text)
+        with metrics.timer('stage_seconds', stage='summary_map', source='bedrock'):
+            partial = self.bedrock.invoke_model(prompt, max_tokens=MAP_MAX_TOKENS, cache=True)
+        # 失敗したチャンクも最終要約から抜け落ちないよう、冒頭部分で代用する
+        return partial or truncate_to_tokens(chunk.text, FALLBACK_TOKENS)
+
+    def summarize_chunks(self, title: str, chunks: List[Chunk], check_cancelled: CancelCheck = None) -> List[str]:
+        """各チャンクの部分要約を並列に生成（順序はチャンクの順）"""
+        return self._gather([self.executor.submit(self._map, title, chunk, check_cancelled) for chunk in chunks])
+
+    def _merge(self, title: str, partials: List[str], check_cancelled: CancelCheck = None) -> str:
+        if len(partials) == 1:
+            return partials[0]
+        if check_cancelled:
+            check_cancelled()
+        prompt = COMBINE_PROMPT.format(title=title, partials='\n\n'.join(partials))
+        with metrics.timer('stage_seconds', stage='summary_combine', source='bedrock'):
+            merged = self.bedrock.invoke_model(prompt, max_tokens=MAP_MAX_TOKENS, cache=True)
+        return merged or '\n\n'.join(truncate_to_tokens(partial, FALLBACK_TOKENS) for partial in partials)
+
+    def _combine(self, title: str, partials: List[str], check_cancelled: CancelCheck = None) -> List[str]:
+        """部分要約の合計が上限を超える間、隣り合う部分要約をまとめてさらに要約する"""
+        while len(partials) > 1 and estimate_tokens('\n\n'.join(partials)) > REDUCE_TOKEN_BUDGET:
+            groups: List[List[str]] = [[]]
+            for partial in partials:
+                if groups[-1] and estimate_tokens('\n\n'.join(groups[-1] + [partial])) > REDUCE_TOKEN_BUDGET // 2:
+                    groups.append([])
+                groups[-1].append(partial)
+            if len(groups) == len(partials):
+                # これ以上まとめられない場合は、各部分要約を切り詰めて上限に収める
+                return [truncate_to_tokens(partial, REDUCE_TOKEN_BUDGET // len(partials)) for partial in partials]
+            partials = self._gather([self.executor.submit(self._merge, title, group, check_cancelled)
+                                     for group in groups])
+        return partials
+
+    def build_prompt(self, paper: Dict, paper_content: Optional[str] = None, language: str = '日本語',
+                     check_cancelled: CancelCheck = None) -> str:
+        """最終要約のプロンプトを作る（本文が長い場合は、ここで部分要約を生成してから組み立てる）
+
+        check_cancelledは部分要約の各呼び出しの前に呼ばれ、例外を送出すると残りの呼び出しを取り消して中断する。
+        """
+        template = SUMMARY_PROMPTS[language]
+        metadata = template['metadata'].format(title=paper['title'], authors=paper['authors'],
+                                               summary=paper['summary'], category=paper['primary_category'])
+        sections = [template['intro'], metadata]
+        chunks = split_chunks(paper_content) if paper_content else []
+        if len(chunks) == 1:
+            sections += [f"{template['full_text']}\n{chunks[0].text}", template['focus']]
+        elif chunks:
+            partials = self.summarize_chunks(paper['title'], chunks, check_cancelled)
+            partials = self._combine(paper['title'], partials, check_cancelled)
+            body = '\n\n'.join(
+                f"### {', '.join(chunk.sections)}\n{partial}" if len(partials) == len(chunks) else partial
+                for chunk, partial in zip(chunks, partials)
+            )
+            sections += [f"{template['partials']}\n{body}", template['focus']]
+        return '\n\n'.join(sections)
+
+    def summarize(self, paper: Dict, paper_content: Optional[str] = None, language: str = '日本語',
+                  check_cancelled: CancelCheck = None) -> Optional[str]:
+        prompt = self.build_prompt(paper, paper_content, language, check_cancelled)
+        if check_cancelled:
+            check_cancelled()
+        with metrics.timer('stage_seconds', stage='summary_reduce', source='bedrock'):
+            return self.bedrock.invoke_model(prompt, cache=True)
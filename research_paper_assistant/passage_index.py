@@ -0,0 +1,175 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+from .token_budget import estimate_tokens
+
+DEFAULT_TOP_K = int(os.getenv('PASSAGE_TOP_K', 6))
+DEFAULT_TOKEN_BUDGET = int(os.getenv('PASSAGE_TOKEN_BUDGET', 3000))
+MAX_PASSAGE_CHARS = 1500
+MAX_CACHED_INDEXES = 64
+
+_WORD_RE = re.compile(r'[a-z0-9]+|[^\x00-\x7f\s]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """英数字は単語単位、日本語などの非ASCII文字列は文字bigramに分割"""
+    tokens = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word.isascii():
+            tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+@dataclass
+class Passage:
+    section: str
+    text: str
+    position: int  # 本文中での順番
+
+
+def split_passages(text: str, max_chars: int = MAX_PASSAGE_CHARS) -> List[Passage]:
+    """_extract_text_from_xmlの出力を、セクション名を保持した段落単位のパッセージに分割"""
+    passages: List[Passage] = []
+    section = 'Body'
+    buffer: List[str] = []
+
+    def flush():
+        if buffer:
+            passages.append(Passage(section, '\n'.join(buffer), len(passages)))
+            buffer.clear()
+
+    for block in text.split('\n\n'):
+        block = block.strip()
+        if not block:
+            continue
+        if block.startswith('Section:'):
+            flush()
+            section = block[len('Section:'):].strip() or section
+            continue
+        if block.startswith('Title:'):
+            flush()
+            passages.append(Passage('Title', block[len('Title:'):].strip(), len(passages)))
+            continue
+        if block == 'Abstract:':
+            flush()
+            section = 'Abstract'
+            continue
+
+        if buffer and sum(len(b) for b in buffer) + len(block) > max_chars:
+            flush()
+        buffer.append(block)
+    flush()
+    return passages
+
+
+class PassageIndex:
+    """パッセージに対するBM25検索インデックス"""
+
+    def __init__(self, passages: List[Passage], k1: float = 1.5, b: float = 0.75):
+        import numpy as np  # チャットで本文を使うときだけ読み込む
+
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths = []
+        for doc_id, passage in enumerate(passages):
+            counts = Counter(tokenize(f"{passage.section} {passage.text}"))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+
+        self.doc_lengths = np.asarray(lengths, dtype=np.float32)
+        self.avg_length = float(self.doc_lengths.mean()) if len(passages) else 0.0
+        self.postings = {
+            term: (np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries)),
+                   np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries)))
+            for term, entries in postings.items()
+        }
+
+    @classmethod
+    def from_text(cls, text: str) -> 'PassageIndex':
+        return cls(split_passages(text))
+
+    def scores(self, query: str) -> 'np.ndarray':
+        import numpy as np
+
+        n_docs = len(self.passages)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if not n_docs:
+            return scores
+
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_length, 1.0))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            doc_ids, tfs = self.postings[term]
+            idf = math.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + norm[doc_ids])
+        return scores
+
+    def retrieve(self, query: str, top_k: int = DEFAULT_TOP_K,
+                 token_budget: int = DEFAULT_TOKEN_BUDGET) -> List[Passage]:
+        """関連度上位のパッセージを、トークン予算内で本文の順に返す
+
+        質問と一致する語がない場合（日本語の質問と英語の本文など）は冒頭のパッセージを使う。
+        """
+        import numpy as np
+
+        scores = self.scores(query)
+        if scores.size and scores.max() > 0:
+            order = [int(i) for i in np.argsort(-scores, kind='stable') if scores[i] > 0]
+        else:
+            order = list(range(len(self.passages)))
+
+        selected: List[Passage] = []
+        used = 0
+        for doc_id in order:
+            if len(selected) >= top_k:
+                break
+            passage = self.passages[doc_id]
+            tokens = estimate_tokens(passage.text)
+            if used + tokens > token_budget:
+                continue
+            selected.append(passage)
+            used += tokens
+        return sorted(selected, key=lambda p: p.position)
+
+
+def format_passages(passages: List[Passage]) -> str:
+    """プロンプトに埋め込むためにパッセージを整形"""
+    return '\n\n'.join(f"[{p.section}]\n{p.text}" for p in passages)
+
+
+_indexes: 'OrderedDict[Tuple[str, str], PassageIndex]' = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_passage_index(paper_id: str, text: str) -> PassageIndex:
+    """論文ごとのインデックスを一度だけ構築し、プロセス内でLRUキャッシュする"""
+    key = (paper_id, hashlib.sha1(text.encode('utf-8')).hexdigest())
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+
+    index = PassageIndex.from_text(text)
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_CACHED_INDEXES:
+            _indexes.popitem(last=False)
+    return index
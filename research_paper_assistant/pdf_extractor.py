@@ -0,0 +1,127 @@
+import os
+import re
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from .background import get_process_pool, reset_process_pool
+
+# PDFのページ単位の並列抽出に使うプロセス数
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+# 1タスクで処理するページ数（プロセス間の受け渡しとPDFの再読み込みの回数を抑える）
+PAGES_PER_TASK = 8
+# これより少ないページ数なら並列化せずにその場で抽出
+PARALLEL_MIN_PAGES = 16
+
+# 番号付きの見出し（"3 Method"、"4.2. Results" など）
+NUMBERED_HEADING_RE = re.compile(r'^(\d{1,2}(?:\.\d{1,2}){0,2})\.?\s+([A-Z][A-Za-z][^.!?]{0,78})$')
+# 番号なしでも見出しとみなす名前
+HEADING_NAMES = {
+    'abstract', 'introduction', 'background', 'related work', 'method', 'methods', 'methodology',
+    'materials and methods', 'experiments', 'experimental setup', 'results', 'discussion',
+    'conclusion', 'conclusions', 'acknowledgments', 'acknowledgements', 'references', 'bibliography',
+}
+# 以降を本文として使わない見出し
+END_HEADINGS = ('references', 'bibliography', 'acknowledgments', 'acknowledgements', 'appendix')
+
+
+def _extract_pages(path: str, start: int, end: int) -> List[str]:
+    """path の start〜end-1 ページのテキスト（プロセスプールのワーカーで実行）"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or '' for i in range(start, min(end, len(reader.pages)))]
+
+
+def _page_count(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def extract_pdf_pages(path: str) -> List[str]:
+    """PDFの各ページのテキストを、ページ数が多ければプロセスプールで並列に抽出"""
+    count = _page_count(path)
+    if count < PARALLEL_MIN_PAGES or PDF_WORKERS <= 1:
+        return _extract_pages(path, 0, count)
+
+    try:
+        pool = get_process_pool('pdf', PDF_WORKERS)
+        futures = [pool.submit(_extract_pages, path, start, start + PAGES_PER_TASK)
+                   for start in range(0, count, PAGES_PER_TASK)]
+        pages: List[str] = []
+        for future in futures:
+            pages.extend(future.result())
+        return pages
+    except BrokenProcessPool:
+        print("PDF worker pool failed, extracting in-process")
+        reset_process_pool('pdf')
+        return _extract_pages(path, 0, count)
+
+
+def _heading(line: str) -> Optional[str]:
+    """見出しの行なら見出し名を返す"""
+    line = line.strip()
+    if not line or len(line) > 80:
+        return None
+    match = NUMBERED_HEADING_RE.match(line)
+    if match and len(match.group(2).split()) <= 8:
+        return f"{match.group(1)} {match.group(2).strip()}"
+    name = re.sub(r'^[IVX]+\.?\s+', '', line).rstrip(':').strip()
+    if name.lower() in HEADING_NAMES:
+        return name
+    return None
+
+
+def _join_lines(lines: List[str]) -> str:
+    """改行を詰め、行末のハイフネーションを戻す"""
+    text = ''
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if text.endswith('-') and line[:1].islower():
+            text = text[:-1] + line
+        else:
+            text = f"{text} {line}" if text else line
+    return text
+
+
+def split_sections(pages: List[str]) -> Tuple[str, List[Tuple[str, str]]]:
+    """ページのテキストを見出しで区切り、(最初の見出しより前のテキスト, [(見出し, 本文)]) を返す"""
+    preamble: List[str] = []
+    sections: List[Tuple[str, List[str]]] = []
+    for line in '\n'.join(pages).splitlines():
+        heading = _heading(line)
+        if heading:
+            if heading.lower().lstrip('0123456789. ').startswith(END_HEADINGS):
+                break
+            sections.append((heading, []))
+        elif sections:
+            sections[-1][1].append(line)
+        else:
+            preamble.append(line)
+    return _join_lines(preamble), [(heading, _join_lines(lines)) for heading, lines in sections]
+
+
+def extract_pdf_text(path: str, title: Optional[str] = None, abstract: Optional[str] = None) -> Optional[str]:
+    """PDFから本文を抽出（出力の形式はjats_extractor・latex_extractorと同じ）
+
+    タイトルとアブストラクトは検索結果のメタデータがあればそれを使う。
+    """
+    preamble, sections = split_sections(extract_pdf_pages(path))
+    parts = []
+    if title:
+        parts.append(f"Title: {' '.join(title.split())}")
+    if sections and sections[0][0].lower() == 'abstract':
+        pdf_abstract = sections.pop(0)[1]
+        abstract = abstract or pdf_abstract
+    if abstract:
+        parts.append("\nAbstract:")
+        parts.append(' '.join(abstract.split()))
+    if not sections or not (title or abstract):
+        # 見出しを検出できない場合やメタデータがない場合は、先頭部分もそのまま残す
+        parts.append(preamble)
+    for heading, text in sections:
+        parts.append(f"\nSection: {heading}")
+        parts.append(text)
+    return '\n\n'.join(filter(None, parts)) or None
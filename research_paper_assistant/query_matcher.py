@@ -0,0 +1,84 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .number_converter import NumberConverter
+
+# (小文字の語, 語全体に一致させるか)
+Variant = Tuple[str, bool]
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == '_'
+
+
+def _find_word(text: str, word: str, whole_word: bool) -> bool:
+    """text 中で word が語の先頭から（whole_wordなら語全体として）現れるか"""
+    end = len(word)
+    pos = text.find(word)
+    while pos != -1:
+        if (pos == 0 or not _is_word_char(text[pos - 1])) and \
+                (not whole_word or pos + end == len(text) or not _is_word_char(text[pos + end])):
+            return True
+        pos = text.find(word, pos + 1)
+    return False
+
+
+class QueryMatcher:
+    """検索語を一度だけ解析し、多数のタイトル・アブストラクトに適用する
+
+    空白区切りの各語はAND、"OR" で挟んだ語はいずれか一方で一致。数字はアラビア数字と
+    ローマ数字の両方に語全体として一致させ（"type 2" は "Type II" に一致し "type 22" には一致しない）、
+    それ以外の語は語の先頭に一致させる。大文字・小文字は区別しない。
+    """
+
+    def __init__(self, query: str):
+        self.query = query
+        self.terms: List[List[Variant]] = []  # 各要素はORでまとめた語の候補（要素間はAND）
+        join_next = False
+        for word in query.split():
+            if word == 'OR':
+                join_next = bool(self.terms)
+                continue
+            if word == 'AND':
+                continue
+            variants = [(variant, NumberConverter.is_number(variant))
+                        for variant in sorted(NumberConverter.get_all_number_variants(word))]
+            if join_next:
+                self.terms[-1].extend(variants)
+                join_next = False
+            else:
+                self.terms.append(variants)
+
+    def _matches_lower(self, text: str) -> bool:
+        for variants in self.terms:
+            for word, whole_word in variants:
+                # 部分文字列の有無で先に絞り込み、語の境界は見つかったときだけ確認する
+                if word in text and _find_word(text, word, whole_word):
+                    break
+            else:
+                return False
+        return True
+
+    def matches(self, *texts: str) -> bool:
+        """与えたテキスト（タイトルとアブストラクトなど）全体に、すべての語が含まれるか"""
+        return bool(self.terms) and self._matches_lower('\n'.join(texts).lower())
+
+    def filter(self, records: Iterable[Dict], fields: Sequence[str] = ('title', 'abstract'),
+               limit: Optional[int] = None) -> List[Dict]:
+        """fieldsのテキストが一致するレコードを、先頭からlimit件まで返す"""
+        if not self.terms:
+            return []
+        matches = self._matches_lower
+        results = []
+        for record in records:
+            if matches('\n'.join(record.get(field) or '' for field in fields).lower()):
+                results.append(record)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+
+@lru_cache(maxsize=256)
+def compile_query(query: str) -> QueryMatcher:
+    """検索語ごとに解析済みのマッチャーを返す（同じ検索語では再利用）"""
+    return QueryMatcher(query)
@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+from .content_store import get_cache_dir
+from .paper_record import PaperRecord
+from .passage_index import tokenize
+
+# 特徴ベクトルの次元（単語と単語bigramをハッシュで割り当てる）
+DIMENSIONS = 2048
+# ベクトル化に使う本文の上限（長い論文でも計算量を抑える）
+MAX_TEXT_CHARS = 50000
+# ベクトルのファイルを拡張するときの最小の行数
+GROWTH_ROWS = 1024
+DEFAULT_TOP_K = int(os.getenv('RELATED_TOP_K', 5))
+# 絞り込みで残す候補の数（top_kの倍数）
+RERANK_FACTOR = 10
+# これより類似度の低い論文は関連論文として返さない
+MIN_SIMILARITY = 0.05
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    row INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    record TEXT NOT NULL,
+    full_text INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+def _paper_key(paper) -> str:
+    # IDの形式はソースごとに異なるため、ソース名と組み合わせる
+    return f"{paper['source']}:{paper['id']}"
+
+
+def _record_of(paper) -> PaperRecord:
+    return paper if isinstance(paper, PaperRecord) else PaperRecord.from_dict(paper)
+
+
+def vectorize(text: str) -> 'np.ndarray':
+    """単語・単語bigramのハッシュ特徴を対数TFで重み付けし、L2正規化したベクトル"""
+    import numpy as np
+
+    tokens = tokenize(text[:MAX_TEXT_CHARS])
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    if not features:
+        return vector
+    buckets = np.fromiter((zlib.crc32(feature.encode('utf-8')) % DIMENSIONS for feature in features),
+                          dtype=np.int64, count=len(features))
+    counts = np.bincount(buckets, minlength=DIMENSIONS).astype(np.float32)
+    present = counts > 0
+    vector[present] = 1.0 + np.log(counts[present])
+    vector /= np.linalg.norm(vector)
+    return vector
+
+
+class RelatedIndex:
+    """取得済みのアブストラクト・本文から作る、関連論文を探すためのローカルの類似度インデックス
+
+    各論文のベクトルはディスク上の行列（vectors.f32）にメモリマップで保存し、論文の情報は
+    SQLiteに保存する。論文を追加するたびにその行だけを書き換え、各次元の文書頻度（df.i32）も
+    差分で更新する。検索は行列とクエリベクトルの積1回で、上流のAPIは使わない。
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else get_cache_dir() / 'related_index'
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / 'papers.sqlite3'
+        self.vectors_path = self.directory / 'vectors.f32'
+        self.df_path = self.directory / 'df.i32'
+        for path, size in ((self.vectors_path, 0), (self.df_path, DIMENSIONS * 4)):
+            if not path.exists():
+                with open(path, 'wb') as f:
+                    f.truncate(size)
+        self._vectors = None
+        self._df = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        """操作ごとに接続を開く（書き込みは他のプロセスと排他にし、ベクトルの更新もその中で行う）"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            if write:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                conn.execute("COMMIT")
+            else:
+                yield conn
+        finally:
+            conn.close()
+
+    def _capacity(self) -> int:
+        return os.path.getsize(self.vectors_path) // (DIMENSIONS * 4)
+
+    def _map(self, rows: int) -> Tuple['np.ndarray', 'np.ndarray']:
+        """rows行以上を含むようにベクトルのファイルをマップし直す（他のプロセスが拡張した場合も含む）"""
+        import numpy as np
+
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[0] < rows:
+                capacity = self._capacity()
+                self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+',
+                                          shape=(capacity, DIMENSIONS)) if capacity else None
+            if self._df is None:
+                self._df = np.memmap(self.df_path, dtype=np.int32, mode='r+', shape=(DIMENSIONS,))
+            return self._vectors, self._df
+
+    def _ensure_capacity(self, rows: int):
+        capacity = self._capacity()
+        if rows > capacity:
+            with open(self.vectors_path, 'r+b') as f:
+                f.truncate(max(rows, capacity * 2, GROWTH_ROWS) * DIMENSIONS * 4)
+
+    def __len__(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def contains(self, paper, full_text: bool = False) -> bool:
+        """論文が登録済みか（full_textなら本文から作ったベクトルで登録済みか）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT full_text FROM papers WHERE key = ?", (_paper_key(paper),)).fetchone()
+        return row is not None and bool(row[0] or not full_text)
+
+    def add(self, paper, full_text: Optional[str] = None) -> bool:
+        """論文を登録（本文があれば本文も使う）。登録済みで更新する必要がなければFalse"""
+        if self.contains(paper, full_text=bool(full_text)):
+            return False
+        record = _record_of(paper)
+        # タイトルは2回入れて、本文の長さに埋もれないようにする
+        vector = vectorize('\n'.join(filter(None, (record.title, record.title, record.summary, full_text))))
+        key = _paper_key(record)
+
+        with self._connect(write=True) as conn:
+            row = conn.execute("SELECT row, full_text FROM papers WHERE key = ?", (key,)).fetchone()
+            if row is not None and (row[1] or not full_text):
+                return False  # 他のスレッド・プロセスが先に登録した
+            if row is None:
+                index = conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+                self._ensure_capacity(index + 1)
+            else:
+                index = row[0]
+            vectors, df = self._map(index + 1)
+            if row is not None:
+                df -= vectors[index] > 0
+            vectors[index] = vector
+            df += vector > 0
+            vectors.flush()
+            df.flush()
+            conn.execute(
+                "INSERT INTO papers(row, key, record, full_text, updated) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET record = excluded.record, full_text = excluded.full_text, "
+                "updated = excluded.updated",
+                (index, key, json.dumps(record.to_tuple(), ensure_ascii=False), int(bool(full_text)), time.time())
+            )
+        return True
+
+    def related(self, paper, top_k: int = DEFAULT_TOP_K) -> List[Tuple[PaperRecord, float]]:
+        """登録済みの論文のうち、paperに近いものを類似度の高い順に返す（paperが未登録なら空）"""
+        import numpy as np
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT row FROM papers WHERE key = ?", (_paper_key(paper),)).fetchone()
+            count = conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+        if row is None or count < 2:
+            return []
+        vectors, df = self._map(count)
+        matrix = vectors[:count]
+
+        # 多くの論文に現れる特徴ほど軽くする。全件はIDFの2乗で重み付けしたクエリとの内積1回で絞り込み、
+        # 候補だけを文書側にもIDFを掛けたコサイン類似度で並べ直す
+        idf = np.log((count + 1) / (df + 1.0)).astype(np.float32) + 1.0
+        query = matrix[row[0]] * idf
+        if not query.any():
+            return []
+        query /= np.linalg.norm(query)
+        scores = matrix @ (query * idf)
+        scores[row[0]] = -math.inf
+        candidates = min(top_k * RERANK_FACTOR, count - 1)
+        candidates = np.argpartition(-scores, candidates - 1)[:candidates]
+        weighted = matrix[candidates] * idf
+        norms = np.linalg.norm(weighted, axis=1)
+        cosine = (weighted @ query) / np.where(norms > 0, norms, 1.0)
+        order = np.argsort(-cosine, kind='stable')[:top_k]
+        order = order[cosine[order] >= MIN_SIMILARITY]
+        if not len(order):
+            return []
+        top = candidates[order]
+        scores = dict(zip(top.tolist(), cosine[order].tolist()))
+
+        placeholders = ','.join('?' * len(top))
+        with self._connect() as conn:
+            records = dict(conn.execute(
+                f"SELECT row, record FROM papers WHERE row IN ({placeholders})", top.tolist()
+            ).fetchall())
+        return [(PaperRecord(*json.loads(records[i])), scores[i]) for i in top.tolist() if i in records]
+
+
+_index: Optional[RelatedIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_related_index() -> RelatedIndex:
+    """プロセス全体で共有される関連論文のインデックスを取得"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = RelatedIndex()
+        return _index
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import unicodedata
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+from . import metrics
+from .content_store import ContentStore, get_cache_dir
+from .paper_record import PaperRecord
+from .paper_sources import SearchPage, get_source
+
+# ソースごとの検索結果の有効期限（秒）
+SOURCE_TTLS = {
+    'arXiv': 6 * 3600,  # 新着の公開は1日1回
+    'bioRxiv': 3600,
+    'PubMed': 3600,
+}
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# 他のプロセスが同じ検索を実行中の場合に待つ上限（秒）
+LEASE_SECONDS = 30.0
+POLL_INTERVAL = 0.1
+# 大文字のままでないと意味が変わる検索演算子（PubMed・arXiv・bioRxivのフィルタ共通）
+OPERATORS = {'AND', 'OR', 'NOT'}
+# 保存形式（PaperRecordの項目）を変えたら上げる。古い形式のエントリは参照されずに期限切れになる
+FORMAT_VERSION = 2
+
+
+def _namespace(source_name: str) -> str:
+    return f"search:{source_name}"
+
+
+def normalize_query(query: str) -> str:
+    """全角・半角、大文字・小文字、空白の違いを吸収した検索語（演算子の AND・OR・NOT は残す）"""
+    words = unicodedata.normalize('NFKC', query).split()
+    return ' '.join(word if word in OPERATORS else word.casefold() for word in words)
+
+
+class SearchCache:
+    """正規化した検索条件をキーとする、セッション・プロセス間で共有される検索結果のキャッシュ
+
+    同じ検索条件の取得が実行中の場合は、上流へ重ねて問い合わせず、その結果を待つ
+    （同一プロセス内はFuture、プロセス間はキャッシュDBのリースで調整）。
+    """
+
+    def __init__(self, store: Optional[ContentStore] = None):
+        if store is None:
+            ttl = os.getenv('SEARCH_CACHE_TTL')
+            store = ContentStore(
+                db_path=get_cache_dir() / 'search_cache.sqlite3',
+                max_bytes=int(os.getenv('SEARCH_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+                ttls={_namespace(name): float(ttl) if ttl else seconds for name, seconds in SOURCE_TTLS.items()},
+                default_ttl=float(ttl) if ttl else DEFAULT_TTL
+            )
+        self.store = store
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(source_name: str, query: str, page_size: int, cursor: Optional[str] = None,
+                 sort_order: Optional[str] = None) -> str:
+        """ソース・正規化した検索語・件数・ページ位置・並び順のハッシュ"""
+        params = [FORMAT_VERSION, source_name, normalize_query(query), page_size, cursor, sort_order]
+        return hashlib.sha256(json.dumps(params, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def get(self, source_name: str, key: str) -> Optional[SearchPage]:
+        value = self.store.get(_namespace(source_name), key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        return [PaperRecord(*paper) for paper in entry['papers']], entry['cursor']
+
+    def set(self, source_name: str, key: str, page: SearchPage):
+        papers, cursor = page
+        # 項目名を繰り返さないよう、各レコードは値の配列として保存
+        self.store.set(_namespace(source_name), key, json.dumps(
+            {'papers': [paper.to_tuple() for paper in papers], 'cursor': cursor}, ensure_ascii=False
+        ))
+
+    def _wait_for_other_process(self, source_name: str, key: str) -> Optional[SearchPage]:
+        """他のプロセスがリースを持っている間、その結果がキャッシュに入るのを待つ"""
+        deadline = time.monotonic() + LEASE_SECONDS
+        while time.monotonic() < deadline:
+            if not self.store.lease_held(key):
+                break
+            time.sleep(POLL_INTERVAL)
+        return self.get(source_name, key)
+
+    def _refresh(self, source_name: str, key: str, search: Callable[[], SearchPage]) -> SearchPage:
+        if not self.store.try_acquire_lease(key, self.owner, LEASE_SECONDS):
+            metrics.incr('search_cache_waits_total', source=source_name, scope='process')
+            page = self._wait_for_other_process(source_name, key)
+            if page is not None:
+                return page
+        try:
+            page = search()
+            # 0件は上流のエラーの可能性があるため保存しない
+            if page[0]:
+                self.set(source_name, key, page)
+            return page
+        finally:
+            self.store.release_lease(key, self.owner)
+
+    def get_or_search(self, source_name: str, key: str, search: Callable[[], SearchPage]) -> SearchPage:
+        """キャッシュにあればそれを返し、なければsearchを実行して保存する（同じキーの実行は1回にまとめる）"""
+        page = self.get(source_name, key)
+        if page is not None:
+            return page
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            metrics.incr('search_cache_waits_total', source=source_name, scope='thread')
+            return future.result()
+
+        try:
+            page = self._refresh(source_name, key, search)
+            future.set_result(page)
+            return page
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """プロセス全体で共有される検索結果キャッシュを取得"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache()
+        return _cache
+
+
+def cached_search_page(source_name: str, query: str, page_size: int, cursor: Optional[str] = None,
+                       sort_order: Optional[str] = None) -> SearchPage:
+    """論文ソースの1ページ分の検索を、共有キャッシュを通して実行"""
+    source = get_source(source_name)
+    if source is None:
+        return [], None
+    cache = get_search_cache()
+    key = cache.make_key(source_name, query, page_size, cursor, sort_order)
+    return cache.get_or_search(source_name, key, lambda: source.search_page(query, page_size, cursor, sort_order))
@@ -0,0 +1,20 @@
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（英数字は約4文字、日本語などは約1文字で1トークン）"""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """概算トークン数が上限に収まるよう末尾を切り詰める"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
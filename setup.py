@@ -5,13 +5,15 @@ setup(
     version="0.1.0",
     packages=find_packages(),
     install_requires=[
-        "streamlit>=1.24.0",
+        "streamlit>=1.37.0",
         "arxiv",
         "requests",
         "python-dotenv",
         "boto3",
         "markdown",
         "pandas",
-        "python-dateutil"
+        "python-dateutil",
+        "numpy",
+        "pypdf"
     ],
 )
\ No newline at end of file